@@ -2,295 +2,962 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import hashlib
+import os
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
+from flask import Flask, Blueprint, current_app, render_template, request, Response, flash, redirect, url_for, abort, session, g, make_response, stream_template, stream_with_context, jsonify
+from flask.cli import AppGroup
+from werkzeug.exceptions import BadRequest, NotFound
+from werkzeug.http import is_resource_modified
+from sqlalchemy.dialects.postgresql import insert
+import click
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-import config
+from cache import LRUCache, PageCache
+from autocomplete import PrefixIndex
+from models import db, Area, Venue, Artist, Show, TableVersion
+from dbpool import engine_options, instrument, pool_status
+from perf import route_stats, track_queries
+from metrics import cache_lookup, render_metrics, track_metrics
+from logs import setup_logging
+from assets import build_assets, init_assets, send_dist_asset
 import sys
 import datetime
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+from urllib.parse import quote, unquote
+try:
+    import orjson
+except ImportError:
+    orjson = None
 #----------------------------------------------------------------------------#
-# App Config.
+# Extensions.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# Babel, dateutil, Flask-Migrate (alembic) and the WTForms classes are
+# imported where they are first used rather than here, so web workers and
+# CLI commands only pay for what they touch.
+moment = Moment()
+page_cache = PageCache()
+name_index = PrefixIndex()
+main = Blueprint('main', __name__)
 
-# TODO: connect to a local postgresql database
-app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+    # the compiled Babel pattern and parsed locale, built once per pair
+    import babel.dates
+    pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+    return pattern, babel.Locale.parse(locale)
+
+
+def format_datetime(value, format='medium', locale=None):
+    # takes datetime objects as they come out of the db; strings are
+    # still accepted and parsed
+    if isinstance(value, str):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    pattern, locale = datetime_pattern(
+        format, locale or current_app.config['DATETIME_LOCALE'])
+    return pattern.apply(value, locale)
+
+
+def format_datetimes(values, format='medium', locale=None):
+    # batch version of format_datetime for lists of show times: the
+    # pattern and locale are looked up once for the whole list
+    pattern, locale = datetime_pattern(
+        format, locale or current_app.config['DATETIME_LOCALE'])
+    return [pattern.apply(value, locale) for value in values]
+
+
+def with_datetimes(shows, format='medium'):
+    # (show, formatted start_time) pairs for a list of shows, so a
+    # template formats them as one batch
+    return zip(shows, format_datetimes([show['start_time'] for show in shows], format))
+
+
+main.add_app_template_filter(format_datetime, 'datetime')
+main.add_app_template_filter(with_datetimes, 'with_datetimes')
 
 #----------------------------------------------------------------------------#
-# Models.
+# Page cache.
 #----------------------------------------------------------------------------#
 
+def cached_page(kind):
+    # serves the rendered page for '<kind>:<id>' from page_cache. Requests
+    # with pending flash messages are rendered fresh and not stored. Pages
+    # are stored with the ETag conditional_page computed for them (it runs
+    # first) and only served while it is still current, so an entry that
+    # missed an invalidation (a show starting, another worker's write) is
+    # rendered again rather than sent out under the new ETag.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if session.get('_flashes'):
+                return view(**kwargs)
+            key = '{}:{}'.format(kind, *kwargs.values())
+            etag = g.get('page_etag', '')
+            entry = page_cache.get(key)
+            page = None
+            if entry is not None:
+                stored_etag, _, page = entry.partition('\n')
+                if stored_etag != etag:
+                    page = None
+            cache_lookup(kind, page is not None)
+            if page is None:
+                page = view(**kwargs)
+                page_cache.set(key, '{}\n{}'.format(etag, page))
+            return page
+        return wrapper
+    return decorator
+
+
+def show_owners(show, attr):
+    history = db.inspect(show).attrs[attr].history
+    return [value for value in history.sum() if value is not None]
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def collect_stale_pages(session, flush_context, instances):
+    # records the cached pages a flush makes stale: the page of every
+    # changed venue/artist and the pages on the other side of its shows
+    stale = session.info.setdefault('stale_pages', set())
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Show):
+                stale.update('venue:{}'.format(venue_id)
+                             for venue_id in show_owners(obj, 'venue_id'))
+                stale.update('artist:{}'.format(artist_id)
+                             for artist_id in show_owners(obj, 'artist_id'))
+            elif isinstance(obj, (Venue, Artist)) and obj.id is not None:
+                if obj not in session.deleted and not session.is_modified(obj):
+                    continue
+                if isinstance(obj, Venue):
+                    kind, other, others = 'venue', 'artist', session.query(
+                        Show.artist_id).filter(Show.venue_id == obj.id)
+                else:
+                    kind, other, others = 'artist', 'venue', session.query(
+                        Show.venue_id).filter(Show.artist_id == obj.id)
+                stale.add('{}:{}'.format(kind, obj.id))
+                stale.update('{}:{}'.format(other, row[0]) for row in others)
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def drop_stale_pages(session):
+    page_cache.delete(*session.info.pop('stale_pages', ()))
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def forget_stale_pages(session):
+    session.info.pop('stale_pages', None)
 
-class Venue(db.Model):
-    __tablename__ = 'Venue'
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
 
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False, unique=True)
-    genres = db.Column(db.ARRAY(db.String))
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    website = db.Column(db.String)
-    seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
-    seeking_description = db.Column(db.String)
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
+# Venue and Artist carry shows_count, upcoming_shows_count and
+# past_shows_count. Show writes adjust them in the same transaction; the
+# `flask fyyur rollover-counters` job moves shows from upcoming to past as
+# their start time goes by.
+
+
+def show_state(show, current=True):
+    # (venue_id, artist_id, start_time) of a show, before or after the
+    # pending changes
+    state = []
+    for attr in ('venue_id', 'artist_id', 'start_time'):
+        history = db.inspect(show).attrs[attr].history
+        if current:
+            values = history.added or history.unchanged
+        else:
+            values = history.deleted or history.unchanged
+        state.append(values[0] if values else None)
+    return tuple(state)
+
+
+def count_show(deltas, state, sign, now):
+    venue_id, artist_id, start_time = state
+    bucket = 'upcoming_shows_count' if start_time is not None and start_time > now else 'past_shows_count'
+    for model, entity_id in ((Venue, venue_id), (Artist, artist_id)):
+        if entity_id is None:
+            continue
+        counters = deltas.setdefault((model, int(entity_id)), {})
+        for column in ('shows_count', bucket):
+            counters[column] = counters.get(column, 0) + sign
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def collect_counter_changes(session, flush_context, instances):
+    deltas = session.info.setdefault('counter_deltas', {})
+    recount = session.info.setdefault('counter_recount', set())
+    now = datetime.now()
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Show):
+                count_show(deltas, show_state(obj), 1, now)
+        for obj in session.dirty:
+            if isinstance(obj, Show) and session.is_modified(obj):
+                old, new = show_state(obj, current=False), show_state(obj)
+                if old != new:
+                    count_show(deltas, old, -1, now)
+                    count_show(deltas, new, 1, now)
+        for obj in session.deleted:
+            if isinstance(obj, Show):
+                count_show(deltas, show_state(obj, current=False), -1, now)
+            elif isinstance(obj, Venue):
+                # its shows go with it through ON DELETE CASCADE, so their
+                # artists are recounted once the flush is done
+                recount.update((Artist, row[0]) for row in session.query(
+                    Show.artist_id).filter(Show.venue_id == obj.id).distinct())
+            elif isinstance(obj, Artist):
+                recount.update((Venue, row[0]) for row in session.query(
+                    Show.venue_id).filter(Show.artist_id == obj.id).distinct())
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def apply_counter_changes(session, flush_context):
+    connection = session.connection()
+    for (model, entity_id), counters in session.info.pop('counter_deltas', {}).items():
+        counters = {column: getattr(model.__table__.c, column) + delta
+                    for column, delta in counters.items() if delta}
+        if counters:
+            connection.execute(model.__table__.update().where(
+                model.__table__.c.id == entity_id).values(counters))
+    recount = session.info.pop('counter_recount', set())
+    for model in (Venue, Artist):
+        ids = [entity_id for owner, entity_id in recount if owner is model and entity_id is not None]
+        if ids:
+            recount_shows(model, ids, connection)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def forget_counter_changes(session):
+    session.info.pop('counter_deltas', None)
+    session.info.pop('counter_recount', None)
+
+
+def recount_shows(model, ids=None, connection=None):
+    # recomputes the counters of `model` rows (all of them, or `ids`) from
+    # the Show table in one UPDATE
+    table = model.__table__
+    owner = Show.venue_id if model is Venue else Show.artist_id
+    now = datetime.now()
+
+    def count(*criteria):
+        return db.select(db.func.count(Show.id)).where(
+            owner == table.c.id, *criteria).scalar_subquery()
+
+    statement = table.update().values(
+        shows_count=count(),
+        upcoming_shows_count=count(Show.start_time > now),
+        past_shows_count=count(Show.start_time <= now))
+    if ids is not None:
+        statement = statement.where(table.c.id.in_(ids))
+    return (connection or db.session).execute(statement).rowcount
+
+
+def rollover_show_counters(since):
+    # recounts the venues and artists with shows that started after `since`,
+    # i.e. shows that may have moved from upcoming to past
+    now = datetime.now()
+    started = db.and_(Show.start_time > since, Show.start_time <= now)
+    venue_ids = [row[0] for row in db.session.query(Show.venue_id).filter(started).distinct()]
+    artist_ids = [row[0] for row in db.session.query(Show.artist_id).filter(started).distinct()]
+    recount_shows(Venue, venue_ids)
+    recount_shows(Artist, artist_ids)
+    db.session.commit()
+    return len(venue_ids), len(artist_ids)
 
-    show_venue_id = db.relationship(
-        'Show', backref='venueshows', passive_deletes=True)
 
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+#----------------------------------------------------------------------------#
+# Areas.
+#----------------------------------------------------------------------------#
 
+# Venues and artists point at the Area of their (city, state), matched on
+# a normalised city, so "San Francisco" and "san francisco " are one area
+# and the venues listing groups by an indexed join. ORM writes set area_id
+# before each flush; bulk loads, which bypass the session, call
+# assign_areas() afterwards.
+
+
+def area_key(city, state):
+    # (city as displayed, city_key, state), or None without a city/state
+    city = ' '.join((city or '').split())
+    state = (state or '').strip().upper()
+    if not city or not state:
+        return None
+    return city, city.lower(), state
+
+
+def find_area(connection, city, city_key, state):
+    # id of the area, which is created if it is new
+    query = db.select(Area.id).where(Area.state == state, Area.city_key == city_key)
+    area_id = connection.execute(query).scalar()
+    if area_id is None:
+        connection.execute(insert(Area).values(
+            city=city, city_key=city_key, state=state).on_conflict_do_nothing())
+        area_id = connection.execute(query).scalar()
+    return area_id
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def resolve_areas(session, flush_context, instances):
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, (Venue, Artist)):
+                continue
+            attrs = db.inspect(obj).attrs
+            if obj not in session.new and not (attrs.city.history.has_changes()
+                                               or attrs.state.history.has_changes()):
+                continue
+            key = area_key(obj.city, obj.state)
+            obj.area_id = find_area(session.connection(), *key) if key else None
+
+
+def assign_areas(model, connection=None):
+    # sets area_id on the `model` rows that have none, creating missing
+    # areas; the SQL twin of area_key()
+    table = model.__table__
+    city = db.func.regexp_replace(db.func.btrim(table.c.city), r'\s+', ' ', 'g')
+    city_key = db.func.lower(city)
+    state = db.func.upper(db.func.btrim(table.c.state))
+    pending = db.and_(table.c.area_id.is_(None), db.func.btrim(table.c.city) != '',
+                      db.func.btrim(table.c.state) != '')
+    connection = connection or db.session
+    connection.execute(insert(Area).from_select(
+        ['city', 'city_key', 'state'],
+        db.select(db.func.min(city), city_key, state).where(pending).group_by(city_key, state)
+    ).on_conflict_do_nothing())
+    return connection.execute(table.update().where(
+        pending, Area.state == state, Area.city_key == city_key).values(area_id=Area.id)).rowcount
 
-class Artist(db.Model):
-    __tablename__ = 'Artist'
 
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False, unique=True)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
-    website = db.Column(db.String)
-    seeking_description = db.Column(db.String)
-    seeking_venue = db.Column(db.String)
-    image_link = db.Column(db.String(500), unique=True)
-    facebook_link = db.Column(db.String(120))
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
+
+# /autocomplete answers from name_index, held in each process. A
+# background thread loads it and reloads it every AUTOCOMPLETE_REFRESH
+# seconds, which picks up bulk loads and the writes of other workers; this
+# process's own session writes are applied as they commit. gunicorn starts
+# the thread as each worker starts, elsewhere the first lookup does, and
+# lookups find nothing until the first load is done.
+
+AUTOCOMPLETE_KINDS = {Venue: 'venue', Artist: 'artist'}
+
+
+def indexed_names():
+    # (kind, id, name) of every venue and artist, busiest first within
+    # each kind, so the ones left out of a full index are the least booked
+    for model, kind in AUTOCOMPLETE_KINDS.items():
+        query = db.session.query(model.id, model.name).order_by(
+            model.upcoming_shows_count.desc(), model.id).limit(name_index.max_entries)
+        for id, name in query.yield_per(10000):
+            yield kind, id, name
 
-    show_artist_id = db.relationship(
-        'Show', backref='artistshows', passive_deletes=True)
 
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+@db.event.listens_for(db.session, 'after_flush')
+def collect_name_changes(session, flush_context):
+    # ids are known after the flush; new/dirty/deleted still list its objects
+    changes = session.info.setdefault('name_changes', [])
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        kind = AUTOCOMPLETE_KINDS.get(type(obj))
+        if kind is None:
+            continue
+        if obj in session.deleted:
+            changes.append((kind, obj.id, None))
+        elif obj in session.new or db.inspect(obj).attrs.name.history.has_changes():
+            changes.append((kind, obj.id, obj.name))
 
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
+@db.event.listens_for(db.session, 'after_commit')
+def apply_name_changes(session):
+    for kind, id, name in session.info.pop('name_changes', ()):
+        if name is None:
+            name_index.remove(kind, id)
+        else:
+            name_index.add(kind, id, name)
 
-class Show(db.Model):
-    __tablename__ = 'Show'
 
-    id = db.Column(db.Integer, primary_key=True)
-    venue_id = db.Column(db.Integer, db.ForeignKey(
-        "Venue.id", ondelete='CASCADE'))
-    artist_id = db.Column(db.Integer, db.ForeignKey(
-        "Artist.id", ondelete='CASCADE'))
-    start_time = db.Column(db.DateTime)
+@db.event.listens_for(db.session, 'after_rollback')
+def forget_name_changes(session):
+    session.info.pop('name_changes', None)
+
+
+def autocomplete_names(prefix, kinds, limit):
+    name_index.start(current_app._get_current_object(), indexed_names)
+    return [{'kind': kind, 'id': id, 'name': name}
+            for kind in kinds for id, name in name_index.search(kind, prefix, limit)][:limit]
 
 
 #----------------------------------------------------------------------------#
-# Filters.
+# Bookings.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+# A show takes up [start_time, end_time) at its venue and for its artist,
+# and the exclusion constraints on Show keep those periods from
+# overlapping. The queries here filter on the same period expression and
+# the same start_time predicate, so they are answered from the
+# constraints' GiST indexes rather than a scan of the timeline.
+
+
+def booked_during(column, value, start, end):
+    # the shows of column == value (a venue or an artist) that overlap
+    # [start, end)
+    return db.and_(column == value, Show.start_time.isnot(None),
+                   Show.period.op('&&')(db.func.tsrange(start, end)))
+
+
+def booking_clashes(venue_id, artist_id, start, end):
+    # ('venue', 'artist') or the part of it that [start, end) would
+    # double-book
+    busy = db.session.query(
+        db.exists().where(booked_during(Show.venue_id, venue_id, start, end)),
+        db.exists().where(booked_during(Show.artist_id, artist_id, start, end))).one()
+    return tuple(side for side, clash in zip(('venue', 'artist'), busy) if clash)
+
+
+def venue_availability(venue_id, start, end):
+    # the shows at a venue overlapping [start, end) and the free periods
+    # between them, clipped to the window
+    shows = db.session.query(Show.id, Show.artist_id, Show.start_time, Show.end_time).filter(
+        booked_during(Show.venue_id, venue_id, start, end)).order_by(Show.start_time).all()
+    free, cursor = [], start
+    for show in shows:
+        if show.start_time > cursor:
+            free.append({'start_time': cursor, 'end_time': show.start_time})
+        cursor = max(cursor, show.end_time)
+    if cursor < end:
+        free.append({'start_time': cursor, 'end_time': end})
+    return {
+        'venue_id': venue_id,
+        'from': start,
+        'to': end,
+        'busy': [{
+            'show_id': show.id,
+            'artist_id': show.artist_id,
+            'start_time': show.start_time,
+            'end_time': show.end_time
+        } for show in shows],
+        'free': free
+    }
+
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def count_deletes(session, flush_context):
+    # bumps TableVersion.deletes for the tables a flush deleted from, in
+    # the same transaction
+    names = {type(obj).__tablename__ for obj in session.deleted
+             if isinstance(obj, (Venue, Artist, Show))}
+    for name in sorted(names):
+        session.connection().execute(
+            insert(TableVersion).values(name=name, deletes=1).on_conflict_do_update(
+                index_elements=[TableVersion.name],
+                set_={'deletes': TableVersion.deletes + 1}))
+
+
+def freshness(model, *criteria):
+    # newest updated_at of the matching rows, and something that changes
+    # with deletes, which leave no updated_at behind: the row count for a
+    # narrow selection (an index range), the table's delete counter for a
+    # whole table, which would otherwise be counted on every request
+    newest = db.session.query(db.func.max(model.updated_at)).filter(*criteria).scalar_subquery()
+    if criteria:
+        deleted = db.session.query(db.func.count(model.id)).filter(*criteria)
+    else:
+        deleted = db.session.query(TableVersion.deletes).filter(
+            TableVersion.name == model.__tablename__)
+    return [newest, deleted.scalar_subquery()]
+
+
+def conditional_page(validators, timed=False):
+    # computes the page's validators in one query before the view runs and
+    # answers 304 Not Modified when the client's copy is still current.
+    # `validators` takes the view arguments and returns scalar subqueries.
+    # A `timed` page changes as its shows start, which no updated_at
+    # records, so it is validated by its ETag alone: a Last-Modified would
+    # let an If-Modified-Since request get a stale 304.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if session.get('_flashes'):
+                return view(**kwargs)
+            state = db.session.query(*validators(**kwargs)).one()
+            stamps = [value for value in state if isinstance(value, datetime)]
+            last_modified = max(stamps) if stamps and not timed else None
+            etag = hashlib.sha1(repr((request.full_path, tuple(state))).encode('utf-8')).hexdigest()
+            g.page_etag = etag
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = Response(status=304)
+            else:
+                response = make_response(view(**kwargs))
+            response.set_etag(etag)
+            if last_modified is not None:
+                # None would be stamped with the current time
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def json_errors(view):
+    # for JSON views outside the api blueprint: their 400s and 404s are
+    # answered like the api's, not with the HTML error pages
+    @wraps(view)
+    def wrapper(**kwargs):
+        try:
+            return view(**kwargs)
+        except (BadRequest, NotFound) as error:
+            return api_error(error)
+    return wrapper
+
+
+def upcoming_shows(*criteria):
+    return db.session.query(db.func.count(Show.id)).filter(
+        Show.start_time > datetime.now(), *criteria).scalar_subquery()
+
 
+def venues_validators():
+    return freshness(Venue)
+
+
+def artists_validators():
+    return freshness(Artist)
+
+
+def shows_validators():
+    return freshness(Show) + freshness(Venue) + freshness(Artist)
+
+
+def venue_validators(venue_id):
+    # the venue, its shows and the artists playing them
+    return freshness(Venue, Venue.id == venue_id) + freshness(Show, Show.venue_id == venue_id) + [
+        upcoming_shows(Show.venue_id == venue_id),
+        db.session.query(db.func.max(Artist.updated_at)).join(
+            Show, Show.artist_id == Artist.id).filter(Show.venue_id == venue_id).scalar_subquery()
+    ]
+
+
+def artist_validators(artist_id):
+    # the artist, its shows and the venues hosting them
+    return freshness(Artist, Artist.id == artist_id) + freshness(Show, Show.artist_id == artist_id) + [
+        upcoming_shows(Show.artist_id == artist_id),
+        db.session.query(db.func.max(Venue.updated_at)).join(
+            Show, Show.venue_id == Venue.id).filter(Show.artist_id == artist_id).scalar_subquery()
+    ]
 
-app.jinja_env.filters['datetime'] = format_datetime
 
 #----------------------------------------------------------------------------#
 # Helper Functions.
 #----------------------------------------------------------------------------#
 
 
-def shows_count(id):
-    all_shows = db.session.query(Show).all()
-    return len(all_shows)
+def naive_datetime(text):
+    # ISO 8601 from a query string, as the naive local time start_time is
+    # stored in; an offset, if given, is converted
+    value = datetime.fromisoformat(text)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
 
 
-def pastShowsVenue(id):
-    past_shows = []
-    today = datetime.today()
-    all_shows = db.session.query(Show, Artist.name, Artist.image_link).join(
-        Show).filter_by(venue_id=id).all()
-    for show in all_shows:
-        show_time = show[0].start_time
-        days_left = (show_time - today).days
-        if days_left < 0:
-            past_shows.append({
-                'artist_id': show[0].artist_id,
-                'artist_name': show[1],
-                'artist_image_link': show[2],
-                'start_time': format_datetime(show_time.strftime("%d/%m/%Y, %H:%M:%S"))
-            })
-    return past_shows
-
-
-def pastShowsArtist(id):
-    past_shows = []
-    today = datetime.today()
-    all_shows = db.session.query(Show, Venue.name, Venue.image_link).join(
-        Show).filter_by(artist_id=id).all()
-    for show in all_shows:
-        show_time = show[0].start_time
-        days_left = (show_time - today).days
-        if days_left < 0:
-            past_shows.append({
-                'venue_id': show[0].venue_id,
-                'venue_name': show[1],
-                'venue_image_link': show[2],
-                'start_time': format_datetime(show_time.strftime("%d/%m/%Y, %H:%M:%S"))
-            })
-    return past_shows
-
-
-def upcomingShowsVenue(id):
-    upcoming_shows = []
-    today = datetime.today()
-    all_shows = db.session.query(Show, Artist.name, Artist.image_link).join(
-        Show).filter_by(venue_id=id).all()
-    for show in all_shows:
-        show_time = show[0].start_time
-        days_left = (show_time - today).days
-        if days_left > 0:
-            upcoming_shows.append({
-                'artist_id': show[0].artist_id,
-                'artist_name': show[1],
-                'artist_image_link': show[2],
-                'start_time': format_datetime(show_time.strftime("%d/%m/%Y, %H:%M:%S"))
-            })
-    return upcoming_shows
-
-
-def upcomingShowsArtist(id):
-    upcoming_shows = []
-    today = datetime.today()
-    all_shows = db.session.query(Show, Venue.name, Venue.image_link).join(
-        Show).filter_by(artist_id=id).all()
+def encode_cursor(values):
+    # a cursor is the row's sort key, one url-quoted value per column
+    return ','.join(quote(str(value), safe='') for value in values)
+
+
+def decode_cursor(cursor, types):
+    values = cursor.split(',')
+    if len(values) != len(types):
+        abort(400)
+    try:
+        return [cast(unquote(value)) for cast, value in zip(types, values)]
+    except ValueError:
+        abort(400)
+
+
+def keyset_page(query, keys, types, cursor_of, stream=False):
+    # keyset pagination driven by ?after=/?before= cursors and ?limit=.
+    # `keys` are the sort columns and must end with a unique one, so each
+    # page is a range scan on the sort index instead of an OFFSET. With
+    # `stream`, page['rows'] is a generator reading from the cursor and
+    # page['next'] is only known once it is exhausted.
+    limit = request.args.get('limit', current_app.config['PAGE_SIZE'], type=int)
+    limit = min(max(limit, 1), current_app.config['MAX_PAGE_SIZE'])
+    after = request.args.get('after')
+    before = request.args.get('before')
+    page = {'rows': [], 'limit': limit, 'next': None, 'prev': None}
+
+    if before:
+        query = query.filter(db.tuple_(*keys) < db.tuple_(*decode_cursor(before, types))).order_by(
+            *[key.desc() for key in keys])
+    else:
+        if after:
+            query = query.filter(db.tuple_(*keys) > db.tuple_(*decode_cursor(after, types)))
+        query = query.order_by(*keys)
+
+    # one extra row tells us whether there is another page
+    query = query.limit(limit + 1)
+    if stream and not before:
+        page['rows'] = stream_keyset_rows(query, page, cursor_of, after)
+        return page
+
+    rows = query.all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if before:
+        rows.reverse()
+
+    page['rows'] = rows
+    if rows:
+        if more or before:
+            page['next'] = encode_cursor(cursor_of(rows[-1]))
+        if (more and before) or after:
+            page['prev'] = encode_cursor(cursor_of(rows[0]))
+    return page
+
+
+def stream_keyset_rows(query, page, cursor_of, after):
+    last = None
+    try:
+        for count, row in enumerate(query.yield_per(100), start=1):
+            if count > page['limit']:
+                page['next'] = encode_cursor(cursor_of(last))
+                continue
+            if count == 1 and after:
+                page['prev'] = encode_cursor(cursor_of(row))
+            last = row
+            yield row
+    finally:
+        # the body is sent after the request's teardown has removed the
+        # session, so nothing else would hand this connection back
+        query.session.close()
+
+
+def genre_filter(model):
+    # ?genre=Jazz&genre=Blues keeps the rows having all of the genres, or
+    # any of them with ?match=any. Both operators (@> and &&) are served by
+    # the GIN index on genres. Returns the genres asked for and the criteria.
+    genres = sorted({genre.strip() for genre in request.args.getlist('genre') if genre.strip()})
+    if not genres:
+        return genres, []
+    if request.args.get('match') == 'any':
+        return genres, [model.genres.overlap(genres)]
+    return genres, [model.genres.contains(genres)]
+
+
+# the unfiltered facets of each table, per process, with the freshness()
+# they were counted at
+facet_cache = LRUCache(maxsize=2, ttl=24 * 3600)
+
+
+def genre_facets(model, criteria=()):
+    # number of matching rows per genre, from one GROUP BY over the
+    # unnested arrays. Counting a whole table is only done again once
+    # freshness() says a row was written or deleted.
+    if not criteria:
+        version = repr(tuple(db.session.query(*freshness(model)).one()))
+        entry = facet_cache.get(model.__tablename__)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        facets = count_genres(model)
+        facet_cache.set(model.__tablename__, (version, facets))
+        return facets
+    return count_genres(model, criteria)
+
+
+def count_genres(model, criteria=()):
+    genre = db.func.unnest(model.genres).column_valued('genre', joins_implicitly=True)
+    count = db.func.count().label('count')
+    rows = db.session.execute(db.select(genre, count).select_from(model).where(
+        *criteria).group_by(genre).order_by(count.desc(), genre)).all()
+    return [{'genre': genre, 'count': count} for genre, count in rows]
+
+
+def venues_by_area(criteria=()):
+    # a page of areas, paged on (state, city, id), each with its number of
+    # venues and the first AREA_VENUES of them by name. The venues of the
+    # whole page come from one LATERAL join on (area_id, name, id).
+    num_venues = db.select(db.func.count(Venue.id)).where(
+        Venue.area_id == Area.id, *criteria).scalar_subquery()
+    has_venues = Area.venues.any(db.and_(*criteria)) if criteria else Area.venues.any()
+    query = db.session.query(Area.id, Area.city, Area.state, num_venues.label('num_venues')).filter(
+        has_venues)
+    page = keyset_page(query, (Area.state, Area.city, Area.id), (str, str, int),
+                       lambda area: (area.state, area.city, area.id))
+
+    venues = {}
+    if page['rows']:
+        top = db.select(Venue.id, Venue.name, Venue.upcoming_shows_count).where(
+            Venue.area_id == Area.id, *criteria).order_by(Venue.name, Venue.id).limit(
+            current_app.config['AREA_VENUES']).lateral()
+        rows = db.session.execute(db.select(Area.id, top.c.id, top.c.name, top.c.upcoming_shows_count)
+                                  .join(top, db.true())
+                                  .where(Area.id.in_([area.id for area in page['rows']]))
+                                  .order_by(Area.id, top.c.name, top.c.id))
+        for area_id, venue_id, name, upcoming in rows:
+            venues.setdefault(area_id, []).append(
+                {'id': venue_id, 'name': name, 'num_upcoming_shows': upcoming})
+
+    page['rows'] = [{
+        'id': area.id,
+        'city': area.city,
+        'state': area.state,
+        'num_venues': area.num_venues,
+        'venues': venues.get(area.id, [])
+    } for area in page['rows']]
+    return page
+
+
+def area_venues_page(area_id, criteria=()):
+    # one area with a page of all its venues, for /venues?area=<id>
+    area = db.session.get(Area, area_id)
+    if area is None:
+        abort(404)
+    query = db.session.query(Venue.id, Venue.name, Venue.upcoming_shows_count).filter(
+        Venue.area_id == area.id, *criteria)
+    page = keyset_page(query, (Venue.name, Venue.id), (str, int),
+                       lambda venue: (venue.name, venue.id))
+    page['rows'] = [{
+        'id': area.id,
+        'city': area.city,
+        'state': area.state,
+        'num_venues': db.session.query(db.func.count(Venue.id)).filter(
+            Venue.area_id == area.id, *criteria).scalar(),
+        'venues': [{'id': venue.id, 'name': venue.name, 'num_upcoming_shows': venue.upcoming_shows_count}
+                   for venue in page['rows']]
+    }]
+    return page
+
+
+def artists_page(criteria=(), stream=False):
+    page = keyset_page(db.session.query(Artist.id, Artist.name).filter(*criteria), (Artist.name, Artist.id),
+                       (str, int), lambda artist: (artist.name, artist.id), stream)
+    page['rows'] = ({'id': artist.id, 'name': artist.name}
+                    for artist in page['rows'])
+    return page
+
+
+def shows_page(stream=False):
+    query = db.session.query(Show, Venue.name, Artist.name, Artist.image_link).join(Venue).join(Artist)
+    page = keyset_page(query, (Show.start_time, Show.id), (naive_datetime, int),
+                       lambda show: (show[0].start_time.isoformat(), show[0].id), stream)
+    page['rows'] = ({
+        'venue_id': show[0].venue_id,
+        'venue_name' : show[1],
+        'artist_id':show[0].artist_id,
+        'artist_name':show[2],
+        'artist_image_link':show[3],
+        'start_time': show[0].start_time
+    } for show in page['rows'])
+    return page
+
+
+def search_by_name(model, search_term, page=1):
+    # case-insensitive substring search on name, served by the pg_trgm GIN
+    # index. The total number of hits comes back in the same query; only
+    # one page of rows is fetched.
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+    pattern = '%' + search_term.replace('\\', '\\\\').replace(
+        '%', '\\%').replace('_', '\\_') + '%'
+
+    query = db.session.query(model.id, model.name, model.upcoming_shows_count,
+                             db.func.count().over()).filter(model.name.ilike(pattern, escape='\\'))
+
+    if current_app.config['SEARCH_RANKING']:
+        # rank hits by how well name/city/genres match the words searched,
+        # then by trigram similarity of the name
+        document = db.func.to_tsvector('simple', db.func.concat_ws(
+            ' ', model.name, model.city, db.func.array_to_string(model.genres, ' ')))
+        rank = db.func.ts_rank(
+            document, db.func.plainto_tsquery('simple', search_term))
+        query = query.order_by(rank.desc(), db.func.similarity(
+            model.name, search_term).desc(), model.name)
+    else:
+        query = query.order_by(model.name)
+
+    rows = query.limit(per_page).offset((page - 1) * per_page).all()
+    total = rows[0][3] if rows else 0
+    return {
+        'count': total,
+        'page': page,
+        'has_next': page * per_page < total,
+        'data': [{
+            'id': row[0],
+            'name': row[1],
+            'num_upcoming_shows': row[2]
+        } for row in rows]
+    }
+
+
+def show_timeline(venue_id=None, artist_id=None):
+    # fetches the shows of a venue (or an artist) in one query, ordered by
+    # start time, and splits them into past and upcoming in a single pass
+    if venue_id is not None:
+        other, key, owner = Artist, 'artist', Show.venue_id == venue_id
+    else:
+        other, key, owner = Venue, 'venue', Show.artist_id == artist_id
+    all_shows = db.session.query(Show.start_time, other.id, other.name, other.image_link).join(
+        other, getattr(Show, key + '_id') == other.id).filter(owner).order_by(Show.start_time).all()
+
+    now = datetime.now()
+    timeline = {'past_shows': [], 'upcoming_shows': []}
     for show in all_shows:
-        show_time = show[0].start_time
-        days_left = (show_time - today).days
-        if days_left > 0:
-            upcoming_shows.append({
-                'venue_id': show[0].venue_id,
-                'venue_name': show[1],
-                'venue_image_link': show[2],
-                'start_time': format_datetime(show_time.strftime("%d/%m/%Y, %H:%M:%S"))
-            })
-    return upcoming_shows
+        bucket = 'past_shows' if show[0] < now else 'upcoming_shows'
+        timeline[bucket].append({
+            key + '_id': show[1],
+            key + '_name': show[2],
+            key + '_image_link': show[3],
+            'start_time': show[0]
+        })
+    timeline['past_shows_count'] = len(timeline['past_shows'])
+    timeline['upcoming_shows_count'] = len(timeline['upcoming_shows'])
+    return timeline
+
+
+def venue_details(venue_id):
+    venue = Venue.query.filter_by(id=venue_id).first_or_404()
+    return {
+        'id': venue.id,
+        'name': venue.name,
+        'genres': venue.genres,
+        'address': venue.address,
+        'city': venue.city,
+        'state': venue.state,
+        'phone': venue.phone,
+        'website': venue.website,
+        'facebook_link': venue.facebook_link,
+        'seeking_talent': venue.seeking_talent,
+        'image_link': venue.image_link,
+        **show_timeline(venue_id=venue_id)
+    }
+
+
+def artist_details(artist_id):
+    artist = Artist.query.filter_by(id=artist_id).first_or_404()
+    return {
+        'id': artist.id,
+        'name': artist.name,
+        'genres': artist.genres,
+        'city': artist.city,
+        'state': artist.state,
+        'phone': artist.phone,
+        'website': artist.website,
+        'facebook_link': artist.facebook_link,
+        'seeking_venue': artist.seeking_venue,
+        'seeking_description': artist.seeking_description,
+        'image_link': artist.image_link,
+        **show_timeline(artist_id=artist_id)
+    }
+
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 
-@app.route('/')
+@main.route('/')
 def index():
     return render_template('pages/home.html')
 
 
+@main.route('/autocomplete')
+def autocomplete():
+    # typeahead for the search boxes: names with a word starting with q,
+    # from the in-process index rather than the database
+    kind = request.args.get('kind')
+    kinds = [kind] if kind in ('venue', 'artist') else ['venue', 'artist']
+    limit = min(request.args.get('limit', current_app.config['AUTOCOMPLETE_RESULTS'], type=int),
+                current_app.config['AUTOCOMPLETE_MAX_RESULTS'])
+    data = autocomplete_names(request.args.get('q', ''), kinds, max(limit, 1))
+    return Response(dumps({'data': data}), mimetype='application/json')
+
+
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@main.route('/venues')
+@conditional_page(venues_validators)
 def venues():
-    # TODO: replace with real venues data.
-    #       num_shows should be aggregated based on number of upcoming shows per venue.
-    all_venues = db.session.query(Venue).all()
-    unique_cities = db.session.query(Venue).distinct(Venue.city).all()
-
-    data = []
-
-    for city in unique_cities:
-        venues_in_city = []
-        for venue in all_venues:
-            if(venue.city == city.city):
-                venues_in_city.append({
-                    'id': venue.id,
-                    'name': venue.name,
-                    'num_upcoming_shows': shows_count(venue.id)
-                })
-        data.append({
-                    'city': city.city,
-                    'state': city.state,
-                    'venues': venues_in_city
-                    })
-
-    return render_template('pages/venues.html', areas=data)
-
-
-@app.route('/venues/search', methods=['POST'])
+    # a page of areas, or of one area's venues with ?area=<id>
+    genres, criteria = genre_filter(Venue)
+    area_id = request.args.get('area', type=int)
+    if area_id:
+        page = area_venues_page(area_id, criteria)
+        criteria.append(Venue.area_id == area_id)
+    else:
+        page = venues_by_area(criteria)
+    return stream_template('pages/venues.html', areas=page['rows'], page=page,
+                           genres=genres, facets=genre_facets(Venue, criteria))
+
+
+@main.route('/venues/search', methods=['GET', 'POST'])
 def search_venues():
-    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-    search_term = request.form.get('search_term')
-    data = []
-    all_venues = db.session.query(Venue).all()
-    for venue in all_venues:
-        if(search_term.lower() in venue.name.lower()):
-            data.append({
-                'id': venue.id,
-                'name': venue.name,
-                'num_upcoming_shows': len(upcomingShowsVenue(venue.id))
-            })
-
-    response = {
-        "count": len(data),
-        "data": data
-    }
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    response = search_by_name(Venue, search_term, max(page, 1))
 
-    return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 
-@app.route('/venues/<int:venue_id>')
+@main.route('/venues/<int:venue_id>')
+@conditional_page(venue_validators, timed=True)
+@cached_page('venue')
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
-    # TODO: replace with real venue data from the venues table, using venue_id
-    data = []
-    all_queried_venues = db.session.query(Venue).filter_by(id=venue_id).all()
-    for venue in all_queried_venues:
-        data.append({
-            'id': venue.id,
-            'name': venue.name,
-            'genres': venue.genres,
-            'address': venue.address,
-            'city': venue.city,
-            'state': venue.state,
-            'phone': venue.phone,
-            'website': venue.website,
-            'facebook_link': venue.facebook_link,
-            'seeking_talent': venue.seeking_talent,
-            'image_link': venue.image_link,
-            'past_shows': pastShowsVenue(venue_id),
-            'upcoming_shows': upcomingShowsVenue(venue_id),
-            'past_shows_count': len(pastShowsVenue(venue_id)),
-            'upcoming_shows_count': len(upcomingShowsVenue(venue_id))
-        })
-    return render_template('pages/show_venue.html', venue=data[0])
+    return render_template('pages/show_venue.html', venue=venue_details(venue_id))
+
+
+@main.route('/venues/<int:venue_id>/availability')
+@json_errors
+def venue_availability_json(venue_id):
+    # free/busy of a venue between ?from= and ?to= (ISO 8601), by default
+    # the next AVAILABILITY_DAYS days
+    try:
+        start = naive_datetime(request.args['from']) if 'from' in request.args \
+            else datetime.now().replace(second=0, microsecond=0)
+        end = naive_datetime(request.args['to']) if 'to' in request.args \
+            else start + timedelta(days=current_app.config['AVAILABILITY_DAYS'])
+    except ValueError:
+        abort(400)
+    if not start < end <= start + timedelta(days=current_app.config['AVAILABILITY_MAX_DAYS']):
+        abort(400)
+    if db.session.query(Venue.id).filter_by(id=venue_id).first() is None:
+        abort(404)
+    return api_response(venue_availability(venue_id, start, end))
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
+    from forms import VenueForm
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     # TODO: insert form data as a new Venue record in the db, instead
     # TODO: modify data to be the data object returned from db insertion
+    from forms import VenueForm
     form = VenueForm()
     if form.validate_on_submit():
         form_data = form.data
@@ -309,14 +976,18 @@ def create_venue_submission():
     for e_type in error_types:
         for error in form.errors[e_type]:
             flash(error)
-    return redirect(url_for('create_venue_submission'))
+    return redirect(url_for('main.create_venue_submission'))
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@main.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
     # TODO: Complete this endpoint for taking a venue_id, and using
     # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
-    venue_delete = db.session.query(Venue).filter_by(id=venue_id).delete()
+    # deleted through the session (not a bulk delete) so the page cache
+    # hears about it
+    venue = db.session.query(Venue).filter_by(id=venue_id).first()
+    if venue is not None:
+        db.session.delete(venue)
     try:
         db.session.commit()
     except AssertionError as err:
@@ -329,62 +1000,43 @@ def delete_venue(venue_id):
         db.session.close()
     # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
     # clicking that button delete it from the db then redirect the user to the homepage
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@main.route('/artists')
+@conditional_page(artists_validators)
 def artists():
-    # TODO: replace with real data returned from querying the database
-    data = Artist.query.all()
-    return render_template('pages/artists.html', artists=data)
+    # rendered as rows arrive from the db, see keyset_page(stream=True)
+    genres, criteria = genre_filter(Artist)
+    page = artists_page(criteria, stream=True)
+    return stream_template('pages/artists.html', artists=page['rows'], page=page,
+                           genres=genres, facets=genre_facets(Artist, criteria))
 
 
-@app.route('/artists/search', methods=['POST'])
+@main.route('/artists/search', methods=['GET', 'POST'])
 def search_artists():
-    # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    response = search_by_name(Artist, search_term, max(page, 1))
 
-    data = []
-    search_query = request.form.get('search_term')
-    all_artists = Artist.query.all()
-    for artist in all_artists:
-        if(search_query.lower() in artist.name.lower()):
-            data.append({'id': artist.id, 'name': artist.name})
-    response = {'count': len(data), 'data': data}
-
-    return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 
-@app.route('/artists/<int:artist_id>')
+@main.route('/artists/<int:artist_id>')
+@conditional_page(artist_validators, timed=True)
+@cached_page('artist')
 def show_artist(artist_id):
-    # shows the venue page with the given venue_id
-    # TODO: replace with real venue data from the venues table, using venue_id
-    artist = Artist.query.filter_by(id=artist_id).all()[0]
-    data = {
-        'id': artist.id,
-        'name': artist.name,
-        'genres': artist.genres,
-        'city': artist.city,
-        'state': artist.state,
-        'phone': artist.phone,
-        'website': artist.website,
-        'facebook_link': artist.facebook_link,
-        'seeking_venue': artist.seeking_venue,
-        'seeking_description': artist.seeking_description,
-        'image_link': artist.image_link,
-        'past_shows': pastShowsArtist(artist_id),
-        'past_shows_count': len(pastShowsArtist(artist_id)),
-        'upcoming_shows': upcomingShowsArtist(artist_id),
-        'upcoming_shows_count': len(upcomingShowsArtist(artist_id))
-    }
-    return render_template('pages/show_artist.html', artist=data)
+    # shows the artist page with the given artist_id
+    return render_template('pages/show_artist.html', artist=artist_details(artist_id))
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
+    from forms import ArtistForm
     form = ArtistForm()
     artist = {
         "id": 4,
@@ -403,23 +1055,24 @@ def edit_artist(artist_id):
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     # TODO: take values from the form submitted, and update existing
     # artist record with ID <artist_id> using the new attributes
 
-    return redirect(url_for('show_artist', artist_id=artist_id))
+    return redirect(url_for('main.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
+    from forms import VenueForm
     form = VenueForm()
     venue = Venue.query.filter_by(id=venue_id).all()[0]
     # TODO: populate form with values from venue with ID <venue_id>
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     # TODO: take values from the form submitted, and update existing
     # venue record with ID <venue_id> using the new attributes
@@ -436,25 +1089,26 @@ def edit_venue_submission(venue_id):
     venue.facebook_link = request.form.get('facebook_link')
 
     db.session.commit()
-    print(venue.genres)
 
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('main.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
+    from forms import ArtistForm
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     # called upon submitting the new artist listing form
     # TODO: insert form data as a new Venue record in the db, instead
     # TODO: modify data to be the data object returned from db insertion
+    from forms import ArtistForm
     form = ArtistForm()
     if form.validate_on_submit():
         form_data = form.data
@@ -484,52 +1138,48 @@ def create_artist_submission():
     for e_type in error_types:
         for error in form.errors[e_type]:
             flash(error)
-    return redirect(url_for('create_artist_submission'))
+    return redirect(url_for('main.create_artist_submission'))
 
 
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
+@conditional_page(shows_validators)
 def shows():
     # displays list of shows at /shows
-    # TODO: replace with real venues data.
-    #       num_shows should be aggregated based on number of upcoming shows per venue.
-    data = []
-    all_shows = db.session.query(Show,Venue.name,Artist.name, Artist.image_link).join(Venue, Artist).all()
-    for show in all_shows:
-        data.append({
-            'venue_id': show[0].venue_id,
-            'venue_name' : show[1],
-            'artist_id':show[0].artist_id,
-            'artist_name':show[2],
-            'artist_image_link':show[3],
-            'start_time': format_datetime((show[0].start_time).strftime("%d/%m/%Y, %H:%M:%S"))
-        })
-    
-    return render_template('pages/shows.html', shows=data)
+    # rendered as rows arrive from the db, see keyset_page(stream=True)
+    page = shows_page(stream=True)
+    return stream_template('pages/shows.html', shows=page['rows'], page=page)
 
 
-@app.route('/shows/create')
+@main.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
+    from forms import ShowForm
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
     # called to create new shows in the db, upon submitting new show listing form
     # TODO: insert form data as a new Show record in the db, instead
+    from forms import ShowForm
     form = ShowForm()
     if form.validate_on_submit():
         form_data = form.data
-        show = Show(venue_id=form_data['venue_id'],
-                    artist_id=form_data['artist_id'], start_time=form_data['start_time'])
-        print('New show added to DB >> ', show)
-        db.session.add(show)
-
+        show = Show(venue_id=form_data['venue_id'], artist_id=form_data['artist_id'],
+                    start_time=form_data['start_time'], duration_minutes=form_data['duration_minutes'])
         try:
+            # the exclusion constraints would refuse a double booking too,
+            # but with a less friendly message
+            clashes = booking_clashes(int(show.venue_id), int(show.artist_id),
+                                      show.start_time, show.end_time)
+            if clashes:
+                flash('The {} already has a show at that time.'.format(' and the '.join(clashes)))
+                return render_template('forms/new_show.html', form=form)
+            db.session.add(show)
             db.session.commit()
         except Exception as e:
             db.session.rollback()
@@ -550,29 +1200,283 @@ def create_show_submission():
     for e_type in error_types:
         for error in form.errors[e_type]:
             flash(error)
-    return redirect(url_for('create_show_submission'))
+    return redirect(url_for('main.create_show_submission'))
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@main.route('/export/<any(venues, artists, shows):kind>')
+def export(kind):
+    # streams the whole table; the first rows go out before the last are read
+    from exporter import FORMATS, export_rows
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        abort(400)
+    response = Response(stream_with_context(export_rows(kind, fmt)), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(kind, fmt)
+    return response
 
 
-@app.errorhandler(404)
+#  Debug
+#  ----------------------------------------------------------------
+
+@main.route('/static/dist/<path:filename>')
+def dist_asset(filename):
+    # bundles from `flask fyyur assets`, cached for good by browsers
+    return send_dist_asset(filename)
+
+
+@main.route('/_debug/pool')
+def debug_pool():
+    # connection pool state, wait and connect times of the worker serving
+    # this request
+    if not current_app.config['DEBUG_ENDPOINTS']:
+        abort(404)
+    return jsonify(pool_status(db.engine))
+
+
+@main.route('/metrics')
+def metrics():
+    # Prometheus scrape target, summed over all workers under gunicorn
+    scrape = render_metrics() if current_app.config['METRICS'] else None
+    if scrape is None:
+        abort(404)
+    body, content_type = scrape
+    return Response(body, content_type=content_type)
+
+
+@main.route('/_debug/perf')
+def debug_perf():
+    # the slowest routes served by this worker; ?order=queries_avg etc.
+    if not current_app.config['DEBUG_ENDPOINTS']:
+        abort(404)
+    order = request.args.get('order', 'seconds_total')
+    if order not in ('seconds_total', 'seconds_avg', 'seconds_max', 'queries_total',
+                     'queries_avg', 'queries_max', 'db_seconds_total', 'db_seconds_avg'):
+        abort(400)
+    return jsonify(routes=route_stats.summary(order, request.args.get('limit', 20, type=int)))
+
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def dumps(data):
+    # orjson when it is installed, the stdlib otherwise; both write
+    # datetimes as ISO 8601
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=lambda value: value.isoformat(), separators=(',', ':'))
+
+
+def api_response(data, status=200):
+    # tagged with an ETag of the body, so a matching If-None-Match gets
+    # an empty 304 instead
+    response = Response(dumps(data), status=status, mimetype='application/json')
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def page_body(page):
+    # rows first: next/prev are filled in as they are read
+    data = list(page['rows'])
+    return {
+        'data': data,
+        'limit': page['limit'],
+        'next': page['next'],
+        'prev': page['prev']
+    }
+
+
+@api.route('/venues', endpoint='venues')
+def list_venues():
+    genres, criteria = genre_filter(Venue)
+    area_id = request.args.get('area', type=int)
+    if area_id:
+        page = area_venues_page(area_id, criteria)
+        criteria.append(Venue.area_id == area_id)
+    else:
+        page = venues_by_area(criteria)
+    return api_response(dict(page_body(page),
+                             facets=genre_facets(Venue, criteria)))
+
+
+@api.route('/venues/<int:venue_id>', endpoint='venue')
+def get_venue(venue_id):
+    return api_response(venue_details(venue_id))
+
+
+@api.route('/venues/search', endpoint='search_venues')
+def search_venues_api():
+    page = request.args.get('page', 1, type=int)
+    return api_response(search_by_name(Venue, request.args.get('search_term', ''), max(page, 1)))
+
+
+@api.route('/artists', endpoint='artists')
+def list_artists():
+    genres, criteria = genre_filter(Artist)
+    return api_response(dict(page_body(artists_page(criteria)),
+                             facets=genre_facets(Artist, criteria)))
+
+
+@api.route('/artists/<int:artist_id>', endpoint='artist')
+def get_artist(artist_id):
+    return api_response(artist_details(artist_id))
+
+
+@api.route('/artists/search', endpoint='search_artists')
+def search_artists_api():
+    page = request.args.get('page', 1, type=int)
+    return api_response(search_by_name(Artist, request.args.get('search_term', ''), max(page, 1)))
+
+
+@api.route('/shows', endpoint='shows')
+def list_shows():
+    return api_response(page_body(shows_page()))
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return api_response({'error': error.name}, status=error.code)
+
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+
+
+@fyyur_cli.command('rollover-counters')
+@click.option('--lookback', default=1440, show_default=True,
+              help='Recount owners of shows that started in the last N minutes.')
+@click.option('--full', is_flag=True, help='Recount every venue and artist.')
+def rollover_counters_command(lookback, full):
+    """Move shows that have started from upcoming to past counters."""
+    if full:
+        venues_count = recount_shows(Venue)
+        artists_count = recount_shows(Artist)
+        db.session.commit()
+    else:
+        venues_count, artists_count = rollover_show_counters(
+            datetime.now() - timedelta(minutes=lookback))
+    click.echo('Recounted {} venues and {} artists.'.format(venues_count, artists_count))
+
+
+@fyyur_cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Format of SOURCE, guessed from its extension by default.')
+@click.option('--chunk-size', default=5000, show_default=True,
+              help='Rows per transaction.')
+@click.option('--method', type=click.Choice(['copy', 'insert']), default='copy', show_default=True,
+              help='COPY FROM STDIN, or batched INSERTs.')
+def import_command(kind, source, fmt, chunk_size, method):
+    """Bulk load venues, artists or shows from a CSV or NDJSON file.
+
+    Rows are checked against the same forms as the web pages; shows may
+    name their venue/artist with venue_name/artist_name instead of ids.
+    Rejected lines are reported on stderr.
+    """
+    from importer import import_rows
+
+    if fmt is None:
+        fmt = 'csv' if source.name.endswith('.csv') else 'ndjson'
+
+    def reject(line_no, error):
+        click.echo('line {}: {}'.format(line_no, error), err=True)
+
+    report = import_rows(kind, source, fmt, chunk_size, method, reject)
+    click.echo('Read {read} rows: {loaded} loaded, {rejected} rejected, '
+               '{skipped} skipped as duplicates.'.format(**report))
+    click.echo('{:.1f}s, {:.0f} rows/s'.format(
+        report['seconds'], report['read'] / report['seconds'] if report['seconds'] else 0))
+
+
+@fyyur_cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('output', type=click.File('wb'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Rows fetched from the server-side cursor at a time.')
+def export_command(kind, output, fmt, batch_size):
+    """Dump venues, artists or shows as CSV or NDJSON."""
+    from exporter import export_rows
+
+    for chunk in export_rows(kind, fmt, batch_size):
+        output.write(chunk)
+
+
+@fyyur_cli.command('assets')
+def assets_command():
+    """Build the fingerprinted CSS/JS bundles under static/dist."""
+    for name, (filename, size) in build_assets(current_app.static_folder).items():
+        click.echo('{:<10} {} ({:,} bytes)'.format(name, filename, size))
+
+
+#----------------------------------------------------------------------------#
+# App factory.
+#----------------------------------------------------------------------------#
+
+def create_app(test_config=None):
+    app = Flask(__name__)
+    app.config.from_object('config')
+    if test_config is not None:
+        app.config.update(test_config)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+    if not app.config['SECRET_KEY']:
+        # every worker must sign sessions and CSRF tokens with the same key
+        if not app.debug:
+            raise RuntimeError('SECRET_KEY must be set outside of debug mode')
+        app.config['SECRET_KEY'] = os.urandom(32)
+
+    # the `flask` command builds the app inside a click context; gunicorn
+    # and wsgi.py do not, and `flask run` serves it like they do
+    command = click.get_current_context(silent=True)
+    cli = command is not None and command.info_name != 'run'
+
+    moment.init_app(app)
+    db.init_app(app)
+    if cli:
+        # only `flask db ...` needs Flask-Migrate, and importing it pulls
+        # in all of alembic
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    page_cache.init_app(app)
+    name_index.init_app(app)
+    init_assets(app)
+    with app.app_context():
+        instrument(db.engine, db.session, app.config)
+        track_queries(app, db.engine)
+        track_metrics(app, db.engine)
+
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+    app.cli.add_command(fyyur_cli)
+
+    setup_logging(app, cli)
+
+    return app
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -580,11 +1484,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
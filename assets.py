@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Static bundles, built by `flask fyyur assets`. Each bundle is the
+# concatenation of its sources, minified, written under static/dist with
+# a content hash in its name and with .gz/.br siblings. Templates ask for
+# bundles through asset_urls(), which reads dist/manifest.json; before a
+# build it lists the source files instead, so development needs no build.
+
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+        'js/script.js',
+    ],
+    'body.js': [
+        'js/libs/jquery-1.11.1.min.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+# a year; bundle names change with their content
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    # comments and runs of whitespace only, without a minifier installed
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    return re.sub(r'\s*([{};:,>])\s*', r'\1', text).strip()
+
+
+def minify_js(text):
+    # plain JS is only minified with rjsmin; most sources are .min already
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    return text
+
+
+def build_bundle(static_folder, name, sources):
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            text = f.read()
+        if not source.endswith('.min.' + name.rsplit('.', 1)[1]):
+            text = minify_css(text) if name.endswith('.css') else minify_js(text)
+        parts.append(text)
+    # a newline and, for scripts, a semicolon keep sources from running together
+    body = ('\n' if name.endswith('.css') else ';\n').join(parts).encode('utf-8')
+
+    stem, ext = name.rsplit('.', 1)
+    filename = '{}.{}.{}'.format(stem, hashlib.sha256(body).hexdigest()[:12], ext)
+    path = os.path.join(static_folder, DIST, filename)
+    with open(path, 'wb') as f:
+        f.write(body)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(body, 9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(body))
+    return filename, len(body)
+
+
+def build_assets(static_folder):
+    # writes every bundle and the manifest; returns {bundle: (file, size)}
+    dist = os.path.join(static_folder, DIST)
+    os.makedirs(dist, exist_ok=True)
+    # bundles of earlier builds are left in place: cached pages and workers
+    # still running the old code may refer to them
+    built = {name: build_bundle(static_folder, name, sources)
+             for name, sources in BUNDLES.items()}
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump({name: filename for name, (filename, _) in built.items()}, f, indent=2)
+        f.write('\n')
+    return built
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_urls(name):
+    # the URLs a template includes for bundle `name`
+    manifest = current_app.extensions['assets']
+    if name in manifest:
+        return [url_for('main.dist_asset', filename=manifest[name])]
+    return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+
+def send_dist_asset(filename):
+    # a built bundle, precompressed when the client accepts it
+    folder = os.path.join(current_app.static_folder, DIST)
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.isfile(os.path.join(folder, filename + suffix)):
+            response = send_from_directory(folder, filename + suffix)
+            response.headers['Content-Encoding'] = encoding
+            response.mimetype = 'text/css' if filename.endswith('.css') else 'text/javascript'
+            break
+    else:
+        response = send_from_directory(folder, filename)
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_assets(app):
+    app.extensions['assets'] = load_manifest(app.static_folder)
+    app.add_template_global(asset_urls)
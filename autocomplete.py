@@ -0,0 +1,124 @@
+import bisect
+import os
+import threading
+import time
+
+# In-process prefix index of venue and artist names, behind /autocomplete.
+# Entries are (kind, key, id, name) tuples in one sorted list, where key
+# is the casefolded name starting at one of its first words, so "hop"
+# finds "The Musical Hop". A lookup is a bisect and a short scan. The
+# index is bounded by max_entries; names that do not fit are still found
+# by the search pages. Reloads happen on a thread of each process, never
+# on a request.
+
+
+def normalise(text):
+    return ' '.join(text.casefold().split())
+
+
+class PrefixIndex:
+
+    def __init__(self, max_entries=200000, max_words=4, refresh=300, retry=10):
+        self.max_entries = max_entries
+        self.max_words = max_words
+        self.refresh = refresh
+        self.retry = retry
+        self.built_at = None
+        self._entries = []
+        self._names = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def init_app(self, app):
+        self.max_entries = app.config['AUTOCOMPLETE_MAX_ENTRIES']
+        self.max_words = app.config['AUTOCOMPLETE_WORDS']
+        self.refresh = app.config['AUTOCOMPLETE_REFRESH']
+        app.extensions['autocomplete'] = self
+
+    def keys(self, name):
+        words = normalise(name).split(' ')
+        return {' '.join(words[i:]) for i in range(min(len(words), self.max_words))} - {''}
+
+    def load(self, rows):
+        # replaces the whole index with (kind, id, name) rows, most wanted
+        # first: once the index is full the rest are left out
+        entries, names = [], {}
+        for kind, id, name in rows:
+            keys = self.keys(name)
+            if len(entries) + len(keys) > self.max_entries:
+                break
+            entries.extend((kind, key, id, name) for key in keys)
+            names[kind, id] = name
+        entries.sort()
+        with self._lock:
+            self._entries, self._names = entries, names
+            self.built_at = time.monotonic()
+
+    def start(self, app, rows):
+        # reloads the index from rows() every `refresh` seconds on a thread
+        # of this process; threads do not survive fork, so a forked worker
+        # starts its own on its first call
+        if self._refresher == os.getpid():
+            return
+        with self._lock:
+            if self._refresher == os.getpid():
+                return
+            self._refresher = os.getpid()
+        threading.Thread(target=self._refresh, args=(app, rows),
+                         name='autocomplete-refresh', daemon=True).start()
+
+    def _refresh(self, app, rows):
+        while True:
+            if self.built_at is not None:
+                time.sleep(max(self.built_at + self.refresh - time.monotonic(), 0))
+            try:
+                with app.app_context():
+                    self.load(rows())
+            except Exception:
+                app.logger.exception('Reloading the autocomplete index failed')
+                time.sleep(self.retry)
+
+    def add(self, kind, id, name):
+        with self._lock:
+            self._remove(kind, id)
+            keys = self.keys(name)
+            if len(self._entries) + len(keys) > self.max_entries:
+                return
+            for key in keys:
+                bisect.insort(self._entries, (kind, key, id, name))
+            self._names[kind, id] = name
+
+    def remove(self, kind, id):
+        with self._lock:
+            self._remove(kind, id)
+
+    def _remove(self, kind, id):
+        name = self._names.pop((kind, id), None)
+        if name is None:
+            return
+        for key in self.keys(name):
+            entry = (kind, key, id, name)
+            i = bisect.bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def search(self, kind, prefix, limit=10):
+        # [(id, name)] of up to `limit` names with a word starting with
+        # `prefix`, in order of the matching text
+        prefix = normalise(prefix)
+        if not prefix:
+            return []
+        found = {}
+        with self._lock:
+            entries = self._entries
+            i = bisect.bisect_left(entries, (kind, prefix))
+            while i < len(entries) and len(found) < limit:
+                entry_kind, key, id, name = entries[i]
+                if entry_kind != kind or not key.startswith(prefix):
+                    break
+                found.setdefault(id, name)
+                i += 1
+        return list(found.items())
+
+    def __len__(self):
+        return len(self._entries)
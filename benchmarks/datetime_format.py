@@ -0,0 +1,41 @@
+"""Per-row cost of formatting show start times.
+
+Compares the old strftime -> dateutil -> babel round-trip with the
+cached `datetime` filter and its batch API.
+
+    python -m benchmarks.datetime_format [rows]
+"""
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import create_app, format_datetime, format_datetimes
+
+
+def legacy_format_datetime(value, format='full'):
+    date = dateutil.parser.parse(value.strftime("%d/%m/%Y, %H:%M:%S"))
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def main(rows=10000):
+    create_app().app_context().push()
+    start = datetime(2035, 4, 1, 20, 0)
+    times = [start + timedelta(hours=i) for i in range(rows)]
+
+    cases = [
+        ('legacy round-trip', lambda: [legacy_format_datetime(t) for t in times]),
+        ('format_datetime', lambda: [format_datetime(t, 'full') for t in times]),
+        ('format_datetimes', lambda: format_datetimes(times, 'full')),
+    ]
+    for name, run in cases:
+        best = min(timeit.repeat(run, number=1, repeat=5))
+        print('{:<20} {:>8.2f} us/row'.format(name, best / rows * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,256 @@
+"""Concurrent HTTP load against a running instance, route by route.
+
+Each route gets --requests requests from --concurrency threads. The
+report has throughput, p50/p95/p99 latency, errors and the mean number of
+SQL statements per request. That is read from /metrics when it is on
+(the fyyur_request_db_queries histogram, which counts the queries a
+streamed page runs after its headers) and from the Server-Timing header
+otherwise (see perf.py). Venue and artist ids and search terms are sampled from the
+API, so seed the database first (benchmarks.seed) and start the app:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    python -m benchmarks.load [--url http://127.0.0.1:8000] [--concurrency 16]
+                              [--requests 500] [--routes venues,show_venue]
+    python -m benchmarks.load --save      # overwrite the baseline
+    python -m benchmarks.load --compare   # exit 1 if a p95 regressed
+
+Only routes that do not write are driven. The exports stream whole
+tables, so they run only when named in --routes.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines', 'load.json')
+QUERIES = re.compile(r'desc="(\d+) queries"')
+QUERY_METRIC = re.compile(
+    r'^fyyur_request_db_queries_(sum|count)\{endpoint="([^"]+)"\} (\S+)$', re.M)
+
+# name: (method, path, needs); `needs` picks what the path is filled with
+ROUTES = {
+    'index': ('GET', '/', None),
+    'autocomplete': ('GET', '/autocomplete?q={}', 'venue_term'),
+    'venues': ('GET', '/venues', None),
+    'search_venues': ('POST', '/venues/search', 'venue_term'),
+    'show_venue': ('GET', '/venues/{}', 'venue_id'),
+    'venue_availability_json': ('GET', '/venues/{}/availability', 'venue_id'),
+    'edit_venue': ('GET', '/venues/{}/edit', 'venue_id'),
+    'create_venue_form': ('GET', '/venues/create', None),
+    'artists': ('GET', '/artists', None),
+    'search_artists': ('POST', '/artists/search', 'artist_term'),
+    'show_artist': ('GET', '/artists/{}', 'artist_id'),
+    'edit_artist': ('GET', '/artists/{}/edit', 'artist_id'),
+    'create_artist_form': ('GET', '/artists/create', None),
+    'shows': ('GET', '/shows', None),
+    'create_shows': ('GET', '/shows/create', None),
+    'api.venues': ('GET', '/api/v1/venues', None),
+    'api.venue': ('GET', '/api/v1/venues/{}', 'venue_id'),
+    'api.search_venues': ('GET', '/api/v1/venues/search?search_term={}', 'venue_term'),
+    'api.artists': ('GET', '/api/v1/artists', None),
+    'api.artist': ('GET', '/api/v1/artists/{}', 'artist_id'),
+    'api.search_artists': ('GET', '/api/v1/artists/search?search_term={}', 'artist_term'),
+    'api.shows': ('GET', '/api/v1/shows', None),
+}
+EXPORTS = {
+    'export_venues': ('GET', '/export/venues', None),
+    'export_artists': ('GET', '/export/artists', None),
+    'export_shows': ('GET', '/export/shows', None),
+}
+
+
+def fetch(url, data=None):
+    # (status, seconds, SQL statements or None); the body is read in full
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=60) as response:
+            response.read()
+            status, headers = response.status, response.headers
+    except urllib.error.HTTPError as err:
+        err.read()
+        status, headers = err.code, err.headers
+    except OSError:
+        return None, time.perf_counter() - started, None
+    match = QUERIES.search(headers.get('Server-Timing', ''))
+    return status, time.perf_counter() - started, int(match.group(1)) if match else None
+
+
+def query_totals(base):
+    # {endpoint: [queries, requests]} summed over the workers, or None
+    # without /metrics
+    try:
+        with urllib.request.urlopen(base + '/metrics', timeout=60) as response:
+            text = response.read().decode('utf-8')
+    except OSError:
+        return None
+    totals = {}
+    for kind, endpoint, value in QUERY_METRIC.findall(text):
+        totals.setdefault(endpoint, [0.0, 0.0])[kind == 'count'] = float(value)
+    return totals
+
+
+def endpoint_of(name):
+    # route names are the endpoints, without the main blueprint's prefix
+    return name if name.startswith('api.') else 'main.' + name
+
+
+def sample_inputs(base):
+    # ids and search terms taken from the first pages of the API
+    inputs = {}
+    for kind in ('venue', 'artist'):
+        with urllib.request.urlopen('{}/api/v1/{}s?limit=200'.format(base, kind)) as response:
+            body = json.load(response)
+        # venues come grouped by area
+        rows = [venue for area in body['data'] for venue in area['venues']] \
+            if kind == 'venue' else body['data']
+        inputs[kind + '_id'] = sorted({row['id'] for row in rows}) or [1]
+        names = [row['name'] for row in rows]
+        inputs[kind + '_term'] = sorted({word for name in names for word in name.split()
+                                         if len(word) > 2}) or ['a']
+    return inputs
+
+
+def run_route(base, method, path, needs, inputs, requests, concurrency):
+    rng = random.Random(0)
+    jobs = []
+    for _ in range(requests):
+        value = rng.choice(inputs[needs]) if needs else None
+        if method == 'POST':
+            data = urllib.parse.urlencode({'search_term': value}).encode('ascii')
+            jobs.append((base + path, data))
+        else:
+            url = path.format(urllib.parse.quote(str(value))) if needs else path
+            jobs.append((base + url, None))
+
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not jobs:
+                    return
+                url, data = jobs.pop()
+            result = fetch(url, data)
+            with lock:
+                results.append(result)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def percentile(values, q):
+    # nearest rank
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def summarise(results, seconds):
+    latencies = sorted(elapsed for status, elapsed, _ in results)
+    queries = [count for _, _, count in results if count is not None]
+    return {
+        'requests': len(results),
+        'errors': sum(1 for status, _, _ in results if status is None or status >= 400),
+        'rps': len(results) / seconds,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'queries_avg': sum(queries) / len(queries) if queries else None,
+    }
+
+
+def report(routes):
+    print('{:<20} {:>8} {:>6} {:>9} {:>9} {:>9} {:>9} {:>8}'.format(
+        'route', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'queries'))
+    for name, row in routes.items():
+        print('{:<20} {:>8} {:>6} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>8}'.format(
+            name, row['requests'], row['errors'], row['rps'], row['p50_ms'],
+            row['p95_ms'], row['p99_ms'],
+            '-' if row['queries_avg'] is None else '{:.1f}'.format(row['queries_avg'])))
+
+
+def compare(routes, tolerance):
+    # routes whose p95 grew by more than `tolerance`, or that now issue
+    # more queries than in the baseline
+    with open(BASELINE) as f:
+        baseline = json.load(f)['routes']
+    regressions = []
+    for name, row in routes.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if row['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append('{}: p95 {:.1f} ms, was {:.1f} ms'.format(
+                name, row['p95_ms'], before['p95_ms']))
+        if (row['queries_avg'] is not None and before['queries_avg'] is not None
+                and row['queries_avg'] > before['queries_avg'] + 0.5):
+            regressions.append('{}: {:.1f} queries per request, was {:.1f}'.format(
+                name, row['queries_avg'], before['queries_avg']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--routes', help='comma separated route names')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--save', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    args = parser.parse_args()
+
+    available = dict(ROUTES, **EXPORTS)
+    names = args.routes.split(',') if args.routes else list(ROUTES)
+    unknown = set(names) - set(available)
+    if unknown:
+        sys.exit('unknown routes: {}'.format(', '.join(sorted(unknown))))
+
+    base = args.url.rstrip('/')
+    inputs = sample_inputs(base) if any(available[name][2] for name in names) else {}
+    routes = {}
+    for name in names:
+        method, path, needs = available[name]
+        before = query_totals(base)
+        results, seconds = run_route(base, method, path, needs, inputs,
+                                     args.requests, args.concurrency)
+        routes[name] = summarise(results, seconds)
+        after = query_totals(base)
+        if before is not None and after is not None:
+            queries, requests = after.get(endpoint_of(name), [0.0, 0.0])
+            queries -= before.get(endpoint_of(name), [0.0, 0.0])[0]
+            requests -= before.get(endpoint_of(name), [0.0, 0.0])[1]
+            if requests:
+                routes[name]['queries_avg'] = queries / requests
+    report(routes)
+
+    if args.save:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, 'w') as f:
+            json.dump({'concurrency': args.concurrency, 'requests': args.requests,
+                       'routes': routes}, f, indent=2)
+            f.write('\n')
+    if args.compare:
+        if not os.path.exists(BASELINE):
+            sys.exit('no baseline yet, record one with --save')
+        regressions = compare(routes, args.tolerance)
+        for line in regressions:
+            print('regression: ' + line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
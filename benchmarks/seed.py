@@ -0,0 +1,169 @@
+"""Fill the database with synthetic venues, artists and shows.
+
+Names are unique, cities are real (city, state) pairs, genres come from
+the forms, and popular venues and artists get most of the shows. Start
+times are spread over the two years before and the year after today.
+Rows are written with COPY, so the configured database must be
+PostgreSQL.
+
+    python -m benchmarks.seed [--venues 10000] [--artists 100000]
+                              [--shows 5000000] [--truncate]
+
+Refuses to run on a non-empty database unless --truncate is given,
+which empties the Venue, Artist and Show tables first.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app import assign_areas, create_app, page_cache, recount_shows
+from forms import VenueForm
+from importer import chunked, copy_rows
+from models import db, Venue, Artist, Show
+
+CITIES = [
+    ('New York', 'NY'), ('Brooklyn', 'NY'), ('Los Angeles', 'CA'),
+    ('San Francisco', 'CA'), ('Oakland', 'CA'), ('San Diego', 'CA'),
+    ('Chicago', 'IL'), ('Houston', 'TX'), ('Austin', 'TX'), ('Dallas', 'TX'),
+    ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('Pittsburgh', 'PA'),
+    ('Seattle', 'WA'), ('Portland', 'OR'), ('Denver', 'CO'), ('Boston', 'MA'),
+    ('Nashville', 'TN'), ('Memphis', 'TN'), ('New Orleans', 'LA'),
+    ('Atlanta', 'GA'), ('Miami', 'FL'), ('Orlando', 'FL'), ('Detroit', 'MI'),
+    ('Minneapolis', 'MN'), ('St. Louis', 'MO'), ('Kansas City', 'MO'),
+    ('Las Vegas', 'NV'), ('Salt Lake City', 'UT'), ('Baltimore', 'MD'),
+    ('Washington', 'DC'), ('Charlotte', 'NC'), ('Columbus', 'OH'),
+    ('Cleveland', 'OH'), ('Milwaukee', 'WI'), ('Louisville', 'KY'),
+]
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+VENUE_WORDS = ['Hall', 'Room', 'Lounge', 'Club', 'Theatre', 'Garage', 'Cellar',
+               'Ballroom', 'Tavern', 'Warehouse', 'Bowl', 'Stage']
+ARTIST_WORDS = ['Echo', 'Velvet', 'Harbor', 'Static', 'Juniper', 'Neon', 'Owl',
+                'Cinder', 'Lantern', 'Marble', 'Paper', 'Satellite', 'Willow']
+
+
+def skewed(rng, n):
+    # an id in 1..n, low ids far more likely
+    return int(n * rng.random() ** 3) + 1
+
+
+def venue_rows(rng, count):
+    for i in range(1, count + 1):
+        city, state = rng.choice(CITIES)
+        yield {
+            'name': 'The {} {} #{}'.format(rng.choice(ARTIST_WORDS), rng.choice(VENUE_WORDS), i),
+            'genres': rng.sample(GENRES, rng.randint(1, 4)),
+            'city': city,
+            'state': state,
+            'address': '{} {} St'.format(rng.randint(1, 9999), rng.choice(ARTIST_WORDS)),
+            'phone': '{:03d}-{:03d}-{:04d}'.format(
+                rng.randint(200, 999), rng.randint(100, 999), rng.randint(0, 9999)),
+            'seeking_talent': rng.random() < 0.3,
+            'image_link': 'https://images.example.com/venues/{}.jpg'.format(i),
+            'facebook_link': 'https://www.facebook.com/venue{}'.format(i),
+        }
+
+
+def artist_rows(rng, count):
+    for i in range(1, count + 1):
+        city, state = rng.choice(CITIES)
+        yield {
+            'name': '{} {} {}'.format(rng.choice(ARTIST_WORDS), rng.choice(ARTIST_WORDS), i),
+            'genres': rng.sample(GENRES, rng.randint(1, 3)),
+            'city': city,
+            'state': state,
+            'phone': '{:03d}-{:03d}-{:04d}'.format(
+                rng.randint(200, 999), rng.randint(100, 999), rng.randint(0, 9999)),
+            'image_link': 'https://images.example.com/artists/{}.jpg'.format(i),
+            'facebook_link': 'https://www.facebook.com/artist{}'.format(i),
+        }
+
+
+def show_rows(rng, count, venues, artists, tries=10):
+    # shows last two hours and start on even hours, so no two may share a
+    # (venue, slot) or an (artist, slot); bitmaps of the booked slots keep
+    # the exclusion constraints happy. A draw that would double-book is
+    # drawn again, and dropped after `tries`, so busy venues and artists
+    # fill up and slightly fewer than `count` shows can come out.
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=730)
+    start -= timedelta(hours=start.hour % 2)
+    slots = 3 * 365 * 12
+    venue_slots = bytearray(venues * slots // 8 + 1)
+    artist_slots = bytearray(artists * slots // 8 + 1)
+    for _ in range(count):
+        for _ in range(tries):
+            venue_id, artist_id = skewed(rng, venues), skewed(rng, artists)
+            slot = rng.randrange(slots)
+            v = (venue_id - 1) * slots + slot
+            a = (artist_id - 1) * slots + slot
+            if not (venue_slots[v >> 3] >> (v & 7)) & 1 and not (artist_slots[a >> 3] >> (a & 7)) & 1:
+                break
+        else:
+            continue
+        venue_slots[v >> 3] |= 1 << (v & 7)
+        artist_slots[a >> 3] |= 1 << (a & 7)
+        yield {
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': start + timedelta(hours=2 * slot),
+            'duration_minutes': 120,
+        }
+
+
+def load(model, columns, rows, chunk_size):
+    loaded = 0
+    started = time.perf_counter()
+    for chunk in chunked(rows, chunk_size):
+        with db.engine.begin() as connection:
+            copy_rows(connection, model.__table__, columns, chunk)
+        loaded += len(chunk)
+        print('\r{:<8} {:>10,}  {:>8.0f} rows/s'.format(
+            model.__tablename__, loaded, loaded / (time.perf_counter() - started)),
+            end='', file=sys.stderr)
+    print(file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=100000)
+    parser.add_argument('--shows', type=int, default=5000000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--truncate', action='store_true')
+    args = parser.parse_args()
+
+    create_app().app_context().push()
+    rng = random.Random(args.seed)
+    if args.truncate:
+        # ids start from 1 again, which the generated shows rely on
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                'TRUNCATE "Show", "Artist", "Venue", "Area" RESTART IDENTITY CASCADE')
+    elif db.session.query(Venue.id).first() or db.session.query(Artist.id).first():
+        sys.exit('database is not empty, pass --truncate to replace its contents')
+    db.session.close()
+
+    load(Venue, ('name', 'genres', 'city', 'state', 'address', 'phone', 'seeking_talent',
+                 'image_link', 'facebook_link'),
+         venue_rows(rng, args.venues), args.chunk_size)
+    load(Artist, ('name', 'genres', 'city', 'state', 'phone', 'image_link', 'facebook_link'),
+         artist_rows(rng, args.artists), args.chunk_size)
+    if args.venues and args.artists:
+        load(Show, ('venue_id', 'artist_id', 'start_time', 'duration_minutes'),
+             show_rows(rng, args.shows, args.venues, args.artists), args.chunk_size)
+
+    # COPY skips the session events that keep areas and counters up to date
+    with db.engine.begin() as connection:
+        assign_areas(Venue, connection)
+        assign_areas(Artist, connection)
+        recount_shows(Venue, connection=connection)
+        recount_shows(Artist, connection=connection)
+        connection.exec_driver_sql('ANALYZE "Area", "Venue", "Artist", "Show"')
+    # only reaches the web workers with a shared (redis) page cache
+    page_cache.clear()
+
+
+if __name__ == '__main__':
+    main()
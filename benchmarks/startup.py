@@ -0,0 +1,90 @@
+"""Cold-start import cost, measured with `python -X importtime`.
+
+Imports an entry point in a fresh interpreter a few times, keeps the
+fastest run and lists the modules with the largest cumulative import
+time. The result can be compared against a baseline tracked in
+benchmarks/baselines/startup.json.
+
+    python -m benchmarks.startup [--target wsgi] [--runs 5] [--top 15]
+    python -m benchmarks.startup --save      # overwrite the baseline
+    python -m benchmarks.startup --compare   # exit 1 on a regression
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines', 'startup.json')
+
+
+def import_times(target):
+    # {module: cumulative microseconds} for one fresh import of `target`
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + target],
+        cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(result.stderr)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(target, runs):
+    best = min((import_times(target) for _ in range(runs)), key=lambda t: t[target])
+    return {
+        'target': target,
+        'total_ms': best[target] / 1000,
+        'modules_ms': {name: us / 1000 for name, us in best.items()},
+    }
+
+
+def report(result, top):
+    print('import {}: {:.1f} ms'.format(result['target'], result['total_ms']))
+    modules = sorted(result['modules_ms'].items(), key=lambda item: -item[1])
+    for name, ms in modules[:top]:
+        print('  {:<40} {:>8.1f} ms'.format(name, ms))
+
+
+def compare(result, tolerance):
+    with open(BASELINE) as f:
+        baseline = json.load(f)
+    if baseline['target'] != result['target']:
+        sys.exit('baseline is for {}'.format(baseline['target']))
+    limit = baseline['total_ms'] * (1 + tolerance)
+    print('baseline {:.1f} ms, now {:.1f} ms (limit {:.1f} ms)'.format(
+        baseline['total_ms'], result['total_ms'], limit))
+    return result['total_ms'] <= limit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', default='wsgi')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--save', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    args = parser.parse_args()
+
+    result = measure(args.target, args.runs)
+    report(result, args.top)
+    if args.save:
+        # only the top-level modules are kept, the rest is noise
+        top = sorted(result['modules_ms'].items(), key=lambda item: -item[1])[:args.top]
+        result['modules_ms'] = dict(top)
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, 'w') as f:
+            json.dump(result, f, indent=2)
+            f.write('\n')
+    if args.compare and not compare(result, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Backends for the rendered page cache. All of them store strings under
+# string keys and expose get/set/delete/clear.
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache:
+    # in-process cache, bounded in size, entries expire after `ttl` seconds
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    # cache shared by every worker, needs the `redis` package
+
+    def __init__(self, url, ttl=300, prefix='fyyur:page:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value.encode('utf-8'), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+def make_cache(config):
+    backend = config.get('PAGE_CACHE_BACKEND', 'lru')
+    if backend == 'lru':
+        return LRUCache(config.get('PAGE_CACHE_SIZE', 1024), config.get('PAGE_CACHE_TTL', 300))
+    if backend == 'redis':
+        return RedisCache(config['PAGE_CACHE_URL'], config.get('PAGE_CACHE_TTL', 300))
+    if backend in (None, 'null'):
+        return NullCache()
+    raise ValueError('Unknown PAGE_CACHE_BACKEND: {}'.format(backend))
+
+
+class PageCache:
+    # the page cache used by the views; the backend is picked from the
+    # app config by init_app
+
+    def __init__(self):
+        self.backend = NullCache()
+
+    def init_app(self, app):
+        self.backend = make_cache(app.config)
+        app.extensions['page_cache'] = self
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
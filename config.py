@@ -1,13 +1,101 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+
+def env_flag(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+# Shared by all worker processes; required unless DEBUG is on
+SECRET_KEY = os.environ.get('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Enable debug mode.
-DEBUG = True
+DEBUG = env_flag('DEBUG', True)
 
 # Connect to the database
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL', 'postgresql://postgres@localhost:5432/fyyurdb')
+
+# Connection pool (per worker process), see dbpool.py
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+# Replace connections older than this many seconds
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# Test connections on checkout so stale ones are replaced
+DB_POOL_PRE_PING = env_flag('DB_POOL_PRE_PING', True)
+# Milliseconds, 0 disables
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))
+# Connecting through PgBouncer in transaction pooling mode
+DB_PGBOUNCER = env_flag('DB_PGBOUNCER', False)
+
+# Serve the /_debug/* pages
+DEBUG_ENDPOINTS = env_flag('DEBUG_ENDPOINTS', DEBUG)
+
+# Per-request query accounting, see perf.py
+PERF_ACCOUNTING = env_flag('PERF_ACCOUNTING', True)
+# Log requests slower than this many milliseconds or issuing this many queries
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_QUERIES = int(os.environ.get('SLOW_REQUEST_QUERIES', 50))
+# Log single statements slower than this many milliseconds
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 100))
+# Statements kept per request for the log and /_debug/perf
+PERF_SLOWEST_QUERIES = 3
+
+# Serve Prometheus metrics on /metrics (needs prometheus_client)
+METRICS = env_flag('METRICS', True)
+
+# Application log, JSON lines written off the request thread (see logs.py).
+# Not used in debug mode, where records go to stderr.
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# 'size': rotate at LOG_MAX_BYTES, 'time': rotate every LOG_ROTATE_WHEN
+LOG_ROTATE = os.environ.get('LOG_ROTATE', 'size')
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_ROTATE_WHEN = os.environ.get('LOG_ROTATE_WHEN', 'midnight')
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 7))
+# One record per request, with its latency
+LOG_REQUESTS = env_flag('LOG_REQUESTS', True)
+
+# Search
+SEARCH_RESULTS_PER_PAGE = 20
+# Order search hits by full-text rank over name/city/genres
+SEARCH_RANKING = True
+
+# Listing pages (/shows, /artists, /venues)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Venues shown under each area on /venues
+AREA_VENUES = 10
+
+# /autocomplete, answered from an in-process index of venue and artist
+# names (see autocomplete.py). Entries are kept for up to
+# AUTOCOMPLETE_WORDS words of each name and capped at
+# AUTOCOMPLETE_MAX_ENTRIES; the index is reloaded from the database every
+# AUTOCOMPLETE_REFRESH seconds.
+AUTOCOMPLETE_MAX_ENTRIES = int(os.environ.get('AUTOCOMPLETE_MAX_ENTRIES', 200000))
+AUTOCOMPLETE_WORDS = 4
+AUTOCOMPLETE_REFRESH = 300
+AUTOCOMPLETE_RESULTS = 10
+AUTOCOMPLETE_MAX_RESULTS = 50
+
+# /venues/<id>/availability: the default and the longest window, in days
+AVAILABILITY_DAYS = 7
+AVAILABILITY_MAX_DAYS = 92
 
+# Locale used by the `datetime` template filter
+DATETIME_LOCALE = 'en_US'
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://postgres@localhost:5432/fyyurdb'
+# Rendered venue/artist page cache: 'lru' (per process), 'redis' or 'null'.
+# An 'lru' cache never hears of the other workers' writes, so with more
+# than one worker (gunicorn.conf.py exports WEB_CONCURRENCY) the default
+# is 'redis' when PAGE_CACHE_URL is set and 'null' otherwise.
+# PAGE_CACHE_URL is only used by 'redis', e.g. 'redis://localhost:6379/0'
+PAGE_CACHE_URL = os.environ.get('PAGE_CACHE_URL')
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND') or (
+    'lru' if int(os.environ.get('WEB_CONCURRENCY', 1)) <= 1
+    else 'redis' if PAGE_CACHE_URL else 'null')
+PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 1024))
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 300))
@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+from sqlalchemy.util import queue as sqla_queue
+
+# Connection pool setup and per-process pool metrics.
+
+
+class PoolStats:
+    # counters for one worker process
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # callables given the length of every checkout that had to wait
+        # for a connection, and of every new connection, see metrics.py
+        self.wait_observers = []
+        self.connect_observers = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.invalidations = 0
+            self.waits = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.connect_seconds = 0.0
+            self.max_connect_seconds = 0.0
+
+    def record(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+        for observe in self.wait_observers:
+            observe(seconds)
+
+    def record_connect(self, seconds):
+        # `connects` itself is counted by the engine's connect event
+        with self._lock:
+            self.connect_seconds += seconds
+            self.max_connect_seconds = max(self.max_connect_seconds, seconds)
+        for observe in self.connect_observers:
+            observe(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'invalidations': self.invalidations,
+                'waits': self.waits,
+                'wait_seconds_total': self.wait_seconds,
+                'wait_seconds_max': self.max_wait_seconds,
+                'connect_seconds_total': self.connect_seconds,
+                'connect_seconds_max': self.max_connect_seconds,
+            }
+
+
+stats = PoolStats()
+
+
+class TimedQueue(sqla_queue.Queue):
+    # the pool's queue of idle connections. A get that finds one, or is
+    # told not to block, is not a wait; one that blocks (every connection
+    # checked out, overflow used up) is timed until it gets a connection
+    # or times out.
+
+    def get(self, block=True, timeout=None):
+        if block:
+            try:
+                return super().get(False)
+            except sqla_queue.Empty:
+                pass
+            started = time.perf_counter()
+            try:
+                return super().get(True, timeout)
+            finally:
+                stats.record_wait(time.perf_counter() - started)
+        return super().get(block, timeout)
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records how long checkouts waited for a connection,
+    # and separately how long opening new connections took
+    _queue_class = TimedQueue
+
+    def _should_wrap_creator(self, creator):
+        invoke = super()._should_wrap_creator(creator)
+
+        def timed_creator(connection_record):
+            started = time.perf_counter()
+            try:
+                return invoke(connection_record)
+            finally:
+                stats.record_connect(time.perf_counter() - started)
+        return timed_creator
+
+
+def engine_options(config):
+    # SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings. With DB_PGBOUNCER
+    # the app keeps no pool of its own (PgBouncer is the pool) and avoids
+    # anything tied to a server session, as transaction pooling hands each
+    # transaction a different server connection.
+    driver = make_url(config['SQLALCHEMY_DATABASE_URI']).get_driver_name()
+    connect_args = {}
+    if config['DB_PGBOUNCER']:
+        options = {'poolclass': NullPool}
+        if driver == 'psycopg':
+            # no server-side prepared statements
+            connect_args['prepare_threshold'] = None
+    else:
+        options = {
+            'poolclass': TimedQueuePool,
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        }
+        if config['DB_STATEMENT_TIMEOUT']:
+            connect_args['options'] = '-c statement_timeout={:d}'.format(
+                config['DB_STATEMENT_TIMEOUT'])
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
+def instrument(engine, session, config):
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        stats.record('connects')
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.record('checkouts')
+
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.record('invalidations')
+
+    if config['DB_PGBOUNCER'] and config['DB_STATEMENT_TIMEOUT']:
+        # a startup option would not survive PgBouncer, so the timeout is
+        # set for each transaction instead
+        @event.listens_for(session, 'after_begin')
+        def set_statement_timeout(session, transaction, connection):
+            connection.exec_driver_sql('SET LOCAL statement_timeout = {:d}'.format(
+                config['DB_STATEMENT_TIMEOUT']))
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {'pid': os.getpid(), 'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': pool.overflow(),
+        })
+    status.update(stats.snapshot())
+    return status
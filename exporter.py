@@ -0,0 +1,65 @@
+import csv
+import io
+from datetime import datetime
+
+from app import dumps
+from models import db, Venue, Artist, Show
+
+# Streaming dumps for /export/<kind> and `flask fyyur export`. Rows are
+# read through a server-side cursor (yield_per) and written out one batch
+# at a time, so memory use does not depend on the size of the table.
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_statement(kind):
+    if kind == 'venues':
+        return db.select(*Venue.__table__.c).order_by(Venue.id)
+    if kind == 'artists':
+        return db.select(*Artist.__table__.c).order_by(Artist.id)
+    return db.select(Show.id, Show.venue_id, Venue.name.label('venue_name'),
+                     Show.artist_id, Artist.name.label('artist_name'),
+                     Show.start_time, Show.duration_minutes, Show.created_at, Show.updated_at).join(
+        Venue, Show.venue_id == Venue.id).join(
+        Artist, Show.artist_id == Artist.id).order_by(Show.id)
+
+
+def csv_value(value):
+    # lists are written the way `flask fyyur import` reads them back
+    if isinstance(value, list):
+        return ';'.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_chunk(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunk(columns, rows):
+    lines = []
+    for row in rows:
+        line = dumps(dict(zip(columns, row)))
+        lines.append(line if isinstance(line, bytes) else line.encode('utf-8'))
+    return b'\n'.join(lines) + b'\n'
+
+
+def export_rows(kind, fmt, batch_size=1000):
+    # yields the dump as bytes, one chunk per batch of rows
+    result = db.session.execute(
+        export_statement(kind).execution_options(yield_per=batch_size))
+    columns = list(result.keys())
+    if fmt == 'csv':
+        yield csv_chunk([columns])
+    for rows in result.partitions():
+        if fmt == 'csv':
+            yield csv_chunk(rows)
+        else:
+            yield ndjson_chunk(columns, rows)
@@ -1,3 +1,5 @@
+import os
+
 from fabric.api import local, settings, abort
 from fabric.contrib.console import confirm
 
@@ -27,6 +29,31 @@ def prepare():
     commit()
     push()
 
+# benchmarks (see benchmarks/seed.py and benchmarks/load.py)
+
+
+def seed(venues=10000, artists=100000, shows=5000000, truncate="no"):
+    # fills an empty database; `fab seed:truncate=yes` replaces the
+    # contents of whatever DATABASE_URL points at, after asking
+    flags = ""
+    if truncate == "yes":
+        if not confirm("Empty the Venue, Artist and Show tables of {}?".format(
+                os.environ.get("DATABASE_URL", "the default database")), default=False):
+            abort("Aborted at user request.")
+        flags = "--truncate "
+    local("python -m benchmarks.seed {}--venues {} --artists {} --shows {}".format(
+        flags, int(venues), int(artists), int(shows)))
+
+
+def bench(url="http://127.0.0.1:8000", save="no"):
+    if save == "yes":
+        local("python -m benchmarks.load --url {} --save".format(url))
+        return
+    with settings(warn_only=True):
+        result = local("python -m benchmarks.load --url {} --compare".format(url))
+    if result.failed and not confirm("Benchmarks regressed. Continue?"):
+        abort("Aborted at user request.")
+
 # deploy to heroku
 
 
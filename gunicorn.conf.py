@@ -0,0 +1,70 @@
+import gc
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The app is imported once in the master (preload_app) and the workers are
+# forked from it. The garbage collector stays off while the app loads and
+# the loaded objects are frozen before forking, so collections in the
+# workers never write to (and copy) the pages they share with the master.
+# The log listener started while loading stays in the master and writes
+# the records of every worker (see logs.py).
+
+os.environ.setdefault('DEBUG', 'false')
+# metrics from every worker are written here and summed on /metrics. This
+# has to happen before the app (and prometheus_client) is preloaded, and
+# the samples of a previous run are dropped.
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'fyyur-metrics'))
+os.makedirs(metrics_dir, exist_ok=True)
+for name in glob.glob(os.path.join(metrics_dir, '*.db')):
+    os.remove(name)
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:{}'.format(os.environ.get('PORT', 8000)))
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# config.py picks the page cache backend from this
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = True
+accesslog = '-'
+
+gc.disable()
+
+
+def when_ready(server):
+    # what app.py imports and builds lazily is loaded here, so the workers
+    # share it rather than each loading it on its first request
+    import dateutil.parser
+    import forms
+    from app import DATETIME_FORMATS, datetime_pattern
+    locale = server.app.wsgi().config['DATETIME_LOCALE']
+    for format in DATETIME_FORMATS:
+        datetime_pattern(format, locale)
+
+    # the master runs on (and runs the log listener), so it collects again
+    # once the loaded objects are frozen; workers inherit both
+    gc.freeze()
+    gc.enable()
+
+
+def post_fork(server, worker):
+    # connections opened by the master must not be shared with the workers
+    from models import db
+    from app import indexed_names, name_index
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # the autocomplete index loads on its own thread, not on a request
+    name_index.start(app, indexed_names)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
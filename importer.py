@@ -0,0 +1,239 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy.dialects.postgresql import insert
+from werkzeug.datastructures import MultiDict
+
+from app import assign_areas, page_cache, recount_shows
+from models import db, Venue, Artist, Show
+from forms import VenueForm, ArtistForm, ShowForm
+
+# Bulk loading for `flask fyyur import`. Rows are streamed from the source
+# file, validated with the same forms as the web views and written in
+# chunks, one transaction per chunk.
+
+# the form, model and columns loaded for each kind; columns left out get
+# their server defaults
+KINDS = {
+    'venues': (VenueForm, Venue, ('name', 'city', 'state', 'address', 'phone',
+                                  'image_link', 'genres', 'facebook_link')),
+    'artists': (ArtistForm, Artist, ('name', 'city', 'state', 'phone',
+                                     'image_link', 'genres', 'facebook_link')),
+    'shows': (ShowForm, Show, ('venue_id', 'artist_id', 'start_time', 'duration_minutes')),
+}
+
+# drivers whose cursors can COPY ... FROM STDIN; others load with INSERT
+COPY_DRIVERS = ('psycopg', 'psycopg2')
+
+
+def read_rows(stream, fmt):
+    # yields (line number, row, error) for each record in the file
+    if fmt == 'csv':
+        # quoted cells may span lines, so numbers come from the reader
+        reader = csv.DictReader(stream)
+        if reader.fieldnames is None:
+            return
+        line_no = reader.line_num + 1
+        for row in reader:
+            yield line_no, row, None
+            line_no = reader.line_num + 1
+        return
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as err:
+            yield line_no, None, 'invalid JSON: {}'.format(err)
+            continue
+        if isinstance(row, dict):
+            yield line_no, row, None
+        else:
+            yield line_no, None, 'expected a JSON object'
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def formdata(row):
+    # NDJSON gives lists for multi-valued fields, CSV cells separate them
+    # with ';' (e.g. genres "Jazz;Blues")
+    data = MultiDict()
+    for key, value in row.items():
+        if value is None or value == '':
+            continue
+        if isinstance(value, list):
+            values = value
+        elif key == 'genres' and isinstance(value, str):
+            values = [genre.strip() for genre in value.split(';') if genre.strip()]
+        else:
+            values = [value]
+        for value in values:
+            data.add(key, str(value))
+    return data
+
+
+def validate(form_class, row):
+    form = form_class(formdata=formdata(row), meta={'csrf': False})
+    if form.validate():
+        return form.data, None
+    return None, '; '.join('{}: {}'.format(field, ', '.join(errors))
+                           for field, errors in form.errors.items())
+
+
+def resolve_show_refs(connection, rows):
+    # fills venue_id/artist_id from venue_name/artist_name and checks that
+    # every referenced id exists, with one query per model for the chunk.
+    # Returns the rows that resolved and (line number, error) for the rest.
+    known = {}
+    for model, key in ((Venue, 'venue'), (Artist, 'artist')):
+        names = {row[key + '_name'] for _, row in rows
+                 if not row.get(key + '_id') and row.get(key + '_name')}
+        ids = {str(row[key + '_id']) for _, row in rows if row.get(key + '_id')}
+        ids = {int(id) for id in ids if id.isdigit()}
+        found = connection.execute(db.select(model.id, model.name).where(
+            db.or_(model.name.in_(names), model.id.in_(ids)))).all()
+        known[key] = ({name: id for id, name in found}, {str(id) for id, _ in found})
+
+    resolved, errors = [], []
+    for line_no, row in rows:
+        missing = []
+        for key in ('venue', 'artist'):
+            by_name, ids = known[key]
+            if not row.get(key + '_id') and row.get(key + '_name'):
+                row[key + '_id'] = by_name.get(row[key + '_name'])
+            if str(row.get(key + '_id')) not in ids:
+                missing.append('unknown {} {!r}'.format(
+                    key, row.get(key + '_name') or row.get(key + '_id')))
+        if missing:
+            errors.append((line_no, '; '.join(missing)))
+        else:
+            resolved.append((line_no, row))
+    return resolved, errors
+
+
+def pg_value(value):
+    if isinstance(value, list):
+        return '{' + ','.join('"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"'
+                              for item in value) + '}'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def copy_rows(connection, table, columns, rows):
+    # COPY ... FROM STDIN in CSV format; empty cells load as NULL
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([pg_value(row.get(column)) for column in columns])
+    sql = 'COPY "{}" ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        table.name, ', '.join('"{}"'.format(column) for column in columns))
+
+    cursor = connection.connection.cursor()
+    try:
+        if connection.dialect.driver == 'psycopg2':
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def load_chunk(connection, table, columns, rows, method):
+    # returns the number of rows written; rows that clash with a unique
+    # or exclusion constraint (a double booking) are skipped
+    rows = [{column: row.get(column) for column in columns} for row in rows]
+    if method == 'copy':
+        try:
+            with connection.begin_nested():
+                copy_rows(connection, table, columns, rows)
+            return len(rows)
+        except connection.dialect.dbapi.Error:
+            # a duplicate or double booking in the chunk fails the whole
+            # COPY; fall back to an insert that skips conflicting rows. The
+            # COPY runs on the raw cursor, so this is the driver's error.
+            pass
+    result = connection.execute(
+        insert(table).on_conflict_do_nothing().returning(table.c.id), rows)
+    return len(result.all())
+
+
+def import_rows(kind, stream, fmt, chunk_size=5000, method='copy', reject=None):
+    form_class, model, columns = KINDS[kind]
+    table = model.__table__
+    report = {'read': 0, 'loaded': 0, 'rejected': 0, 'skipped': 0, 'seconds': 0.0}
+    started = time.perf_counter()
+    if db.engine.dialect.driver not in COPY_DRIVERS:
+        method = 'insert'
+
+    def rejected(line_no, error):
+        report['rejected'] += 1
+        if reject is not None:
+            reject(line_no, error)
+
+    for chunk in chunked(read_rows(stream, fmt), chunk_size):
+        report['read'] += len(chunk)
+        rows = []
+        for line_no, row, error in chunk:
+            if error:
+                rejected(line_no, error)
+            else:
+                rows.append((line_no, row))
+
+        venue_ids, artist_ids = set(), set()
+        with db.engine.begin() as connection:
+            if kind == 'shows':
+                rows, errors = resolve_show_refs(connection, rows)
+                for line_no, error in errors:
+                    rejected(line_no, error)
+            valid = []
+            for line_no, row in rows:
+                data, error = validate(form_class, row)
+                if error:
+                    rejected(line_no, error)
+                else:
+                    valid.append(data)
+            if not valid:
+                continue
+
+            loaded = load_chunk(connection, table, columns, valid, method)
+            report['loaded'] += loaded
+            report['skipped'] += len(valid) - loaded
+
+            if kind == 'shows':
+                # COPY bypasses the session events that keep counters and
+                # cached pages in step
+                venue_ids = {int(row['venue_id']) for row in valid}
+                artist_ids = {int(row['artist_id']) for row in valid}
+                recount_shows(Venue, venue_ids, connection)
+                recount_shows(Artist, artist_ids, connection)
+
+        if venue_ids or artist_ids:
+            # after the commit, like the app's after_commit listeners, so no
+            # worker caches the page again from before the import. This only
+            # reaches the web workers with a shared PAGE_CACHE_BACKEND
+            # (redis); a per-process cache notices the new counts through
+            # the ETag stored with each page instead.
+            page_cache.delete(*['venue:{}'.format(id) for id in venue_ids] +
+                              ['artist:{}'.format(id) for id in artist_ids])
+
+    if kind != 'shows' and report['loaded']:
+        # the session listener that sets area_id does not see these rows
+        with db.engine.begin() as connection:
+            assign_areas(model, connection)
+
+    report['seconds'] = time.perf_counter() - started
+    return report
@@ -0,0 +1,222 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import pickle
+import queue
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# Application log. Request threads only hand records to a queue; a
+# listener thread formats them as JSON lines and writes them to a rotating
+# file. The queue is a Unix datagram socket shared with forked children,
+# so under gunicorn (preload_app) the workers' records are all written by
+# the listener in the master and rotation happens in one place. Sending
+# never blocks and takes no lock shared between processes: when the
+# listener falls behind, records are dropped and the next one sent says
+# how many.
+
+RECORD_FIELDS = ('request_id', 'method', 'path', 'status', 'latency_ms', 'pid',
+                 'exception', 'dropped')
+# records bigger than this are dropped too
+MAX_RECORD_BYTES = 64 * 1024
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in RECORD_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, default=str)
+
+
+class RequestFilter(logging.Filter):
+    # runs on the request thread, where the request context is available
+    def filter(self, record):
+        record.pid = os.getpid()
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+        return True
+
+
+class DatagramQueue:
+    # the queue API the logging handlers use, over a datagram socket. Each
+    # process buffers its records in memory and a thread of its own sends
+    # them, so a slow listener never holds up the logging thread.
+
+    def __init__(self, buffer_size=10000):
+        self.buffer_size = buffer_size
+        self.directory = tempfile.mkdtemp(prefix='fyyur-log-')
+        self.path = os.path.join(self.directory, 'queue.sock')
+        self.reader = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.reader.bind(self.path)
+        self.writer = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._forget()
+        # threads do not survive fork: a child starts its own sender
+        os.register_at_fork(after_in_child=self._forget)
+        atexit.register(self.flush)
+
+    def _forget(self):
+        self.dropped = 0
+        self._buffer = None
+        self._lock = threading.Lock()
+
+    def _buffered(self):
+        with self._lock:
+            if self._buffer is None:
+                self._buffer = queue.Queue(self.buffer_size)
+                threading.Thread(target=self._send, args=(self._buffer,),
+                                 name='log-sender', daemon=True).start()
+            return self._buffer
+
+    def _send(self, buffer):
+        while True:
+            data = buffer.get()
+            if isinstance(data, threading.Event):
+                data.set()
+                continue
+            try:
+                self.writer.sendto(data, self.path)
+            except OSError:
+                pass
+
+    def put_nowait(self, record):
+        # False when the record had to be dropped
+        data = pickle.dumps(record)
+        if len(data) > MAX_RECORD_BYTES:
+            return False
+        try:
+            self._buffered().put_nowait(data)
+        except queue.Full:
+            return False
+        return True
+
+    def put(self, record):
+        # blocking, for the listener's own sentinel: behind what this
+        # process has buffered
+        self._buffered().put(pickle.dumps(record))
+
+    def flush(self, timeout=1.0):
+        # waits, for a while, until what this process buffered is sent
+        if self._buffer is None:
+            return
+        done = threading.Event()
+        try:
+            self._buffer.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def get(self):
+        return pickle.loads(self.reader.recv(MAX_RECORD_BYTES))
+
+    def close(self):
+        self.reader.close()
+        self.writer.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class DatagramQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # records are pickled into the socket: the message is rendered
+        # here and a traceback travels as text
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exception = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.exc_text = None
+        return record
+
+    def enqueue(self, record):
+        # how many records this process dropped since its last one got through
+        record.dropped = self.queue.dropped or None
+        if self.queue.put_nowait(record):
+            self.queue.dropped = 0
+        else:
+            self.queue.dropped += 1
+
+
+class DatagramQueueListener(logging.handlers.QueueListener):
+    def dequeue(self, block):
+        return self.queue.get()
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def file_handler(config):
+    if config['LOG_ROTATE'] == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(
+            config['LOG_FILE'], when=config['LOG_ROTATE_WHEN'],
+            backupCount=config['LOG_BACKUP_COUNT'], utc=True)
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            config['LOG_FILE'], maxBytes=config['LOG_MAX_BYTES'],
+            backupCount=config['LOG_BACKUP_COUNT'])
+    handler.setFormatter(JSONFormatter())
+    return handler
+
+
+def setup_logging(app, cli=False):
+    # request ids and the per-request record are always on; the file is
+    # only written outside of debug mode and the flask command
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def finish_request_log(response):
+        if 'request_id' not in g:
+            return response
+        response.headers['X-Request-ID'] = g.request_id
+        if app.config['LOG_REQUESTS']:
+            latency = (time.perf_counter() - g.request_started) * 1000
+            app.logger.info('%s %s %d %.1f ms', request.method, request.path,
+                            response.status_code, latency,
+                            extra={'status': response.status_code,
+                                   'latency_ms': round(latency, 1)})
+        return response
+
+    if app.debug or cli:
+        return
+
+    log_queue = DatagramQueue()
+    handler = DatagramQueueHandler(log_queue)
+    handler.addFilter(RequestFilter())
+    listener = DatagramQueueListener(log_queue, file_handler(app.config),
+                                     respect_handler_level=True)
+    listener.start()
+    owner = os.getpid()
+
+    @atexit.register
+    def stop_listener():
+        # forked workers inherit this hook, but the listener is the parent's
+        if os.getpid() == owner:
+            listener.stop()
+            log_queue.close()
+
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
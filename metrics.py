@@ -0,0 +1,111 @@
+import os
+import time
+
+from flask import g, request
+from sqlalchemy import event
+
+from dbpool import stats
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+# Prometheus metrics for /metrics, needs the `prometheus_client` package.
+# Under gunicorn every worker writes its samples to files in
+# PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py) and a scrape of any
+# worker adds them all up; without that variable each process reports
+# only its own numbers.
+
+if prometheus_client is not None:
+    REQUEST_SECONDS = Histogram(
+        'fyyur_request_duration_seconds', 'Time to build a response',
+        ['endpoint', 'method'])
+    REQUESTS = Counter(
+        'fyyur_requests', 'Responses sent', ['endpoint', 'method', 'status'])
+    REQUEST_QUERIES = Histogram(
+        'fyyur_request_db_queries', 'SQL statements run per request', ['endpoint'],
+        buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200))
+    REQUEST_DB_SECONDS = Histogram(
+        'fyyur_request_db_seconds', 'Time spent in the database per request', ['endpoint'])
+    POOL_CHECKED_OUT = Gauge(
+        'fyyur_db_pool_checked_out', 'Connections currently checked out',
+        multiprocess_mode='livesum')
+    POOL_CONNECTS = Counter('fyyur_db_pool_connects', 'New database connections')
+    POOL_WAIT_SECONDS = Histogram(
+        'fyyur_db_pool_wait_seconds',
+        'Time checkouts spent blocked on a full pool, waiting for a connection',
+        buckets=(.001, .005, .01, .05, .1, .5, 1, 5, 10, 30))
+    POOL_CONNECT_SECONDS = Histogram(
+        'fyyur_db_pool_connect_seconds', 'Time spent opening new database connections',
+        buckets=(.001, .005, .01, .05, .1, .5, 1, 5, 10, 30))
+    PAGE_CACHE = Counter(
+        'fyyur_page_cache_lookups', 'Page cache lookups', ['kind', 'result'])
+
+
+def cache_lookup(kind, hit):
+    if prometheus_client is not None:
+        PAGE_CACHE.labels(kind, 'hit' if hit else 'miss').inc()
+
+
+def track_metrics(app, engine):
+    # call after perf.track_queries: after_request functions run in reverse
+    # order of registration, so g.perf is still there when ours runs
+    if prometheus_client is None or not app.config['METRICS']:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        POOL_CONNECTS.inc()
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        POOL_CHECKED_OUT.dec()
+
+    stats.wait_observers.append(POOL_WAIT_SECONDS.observe)
+    stats.connect_observers.append(POOL_CONNECT_SECONDS.observe)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'none'
+        method, status = request.method, response.status_code
+        perf = g.get('perf')
+
+        def record():
+            REQUEST_SECONDS.labels(endpoint, method).observe(time.perf_counter() - started)
+            REQUESTS.labels(endpoint, method, status).inc()
+            if perf is not None:
+                REQUEST_QUERIES.labels(endpoint).observe(perf['queries'])
+                REQUEST_DB_SECONDS.labels(endpoint).observe(perf['db_seconds'])
+
+        # a streamed body runs its queries after this, see perf.py
+        if response.is_streamed:
+            response.call_on_close(record)
+        else:
+            record()
+        return response
+
+
+def render_metrics():
+    # (body, content type) for a scrape, None without prometheus_client
+    if prometheus_client is None:
+        return None
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
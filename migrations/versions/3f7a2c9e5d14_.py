@@ -0,0 +1,29 @@
+"""add GIN indexes on genres
+
+Revision ID: 3f7a2c9e5d14
+Revises: c58a0e4f9b12
+Create Date: 2026-10-18 15:02:48.310274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f7a2c9e5d14'
+down_revision = 'c58a0e4f9b12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # answer the @> and && genre filters of /venues and /artists
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False,
+                    postgresql_using='gin')
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
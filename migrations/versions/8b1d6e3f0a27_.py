@@ -0,0 +1,66 @@
+"""add Area table and area_id on venues and artists
+
+Revision ID: 8b1d6e3f0a27
+Revises: 3f7a2c9e5d14
+Create Date: 2026-10-18 16:40:11.582907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1d6e3f0a27'
+down_revision = '3f7a2c9e5d14'
+branch_labels = None
+depends_on = None
+
+# the same normalisation as area_key() in app.py
+CITY = "regexp_replace(btrim({0}.city), '\\s+', ' ', 'g')"
+STATE = "upper(btrim({0}.state))"
+
+
+def upgrade():
+    op.create_table('Area',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('city_key', sa.String(length=120), nullable=False),
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('state', 'city_key', name='uq_Area_state_city_key')
+    )
+    op.create_index('ix_Area_state_city_id', 'Area', ['state', 'city', 'id'], unique=False)
+
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('area_id', sa.Integer(), nullable=True))
+        op.create_foreign_key('{}_area_id_fkey'.format(table), table, 'Area', ['area_id'], ['id'])
+        # one area per distinct normalised (city, state), spelled as its
+        # first spelling in alphabetical order
+        op.execute("""
+            INSERT INTO "Area" (city, city_key, state)
+            SELECT DISTINCT ON (lower({city}), {state}) {city}, lower({city}), {state}
+            FROM "{table}" t
+            WHERE btrim(t.city) <> '' AND btrim(t.state) <> ''
+            ORDER BY lower({city}), {state}, {city}
+            ON CONFLICT (state, city_key) DO NOTHING
+        """.format(table=table, city=CITY.format('t'), state=STATE.format('t')))
+        op.execute("""
+            UPDATE "{table}" t SET area_id = a.id FROM "Area" a
+            WHERE a.state = {state} AND a.city_key = lower({city})
+        """.format(table=table, city=CITY.format('t'), state=STATE.format('t')))
+
+    op.create_index('ix_Venue_area_id_name_id', 'Venue', ['area_id', 'name', 'id'], unique=False)
+    op.create_index(op.f('ix_Artist_area_id'), 'Artist', ['area_id'], unique=False)
+    # the venues listing now pages over areas
+    op.drop_index('ix_Venue_state_city_name_id', table_name='Venue')
+
+
+def downgrade():
+    op.create_index('ix_Venue_state_city_name_id', 'Venue', ['state', 'city', 'name', 'id'], unique=False)
+    op.drop_index(op.f('ix_Artist_area_id'), table_name='Artist')
+    op.drop_index('ix_Venue_area_id_name_id', table_name='Venue')
+    for table in ('Artist', 'Venue'):
+        op.drop_constraint('{}_area_id_fkey'.format(table), table, type_='foreignkey')
+        op.drop_column(table, 'area_id')
+    op.drop_index('ix_Area_state_city_id', table_name='Area')
+    op.drop_table('Area')
@@ -0,0 +1,51 @@
+"""show duration and no double bookings per venue or artist
+
+Revision ID: c4e8a1f7b392
+Revises: 8b1d6e3f0a27
+Create Date: 2026-10-18 18:05:37.204116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a1f7b392'
+down_revision = '8b1d6e3f0a27'
+branch_labels = None
+depends_on = None
+
+# models.SHOW_PERIOD
+PERIOD = "tsrange(start_time, start_time + duration_minutes * interval '1 minute')"
+
+
+def upgrade():
+    # GiST support for the `venue_id WITH =` / `artist_id WITH =` parts
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('Show', sa.Column('duration_minutes', sa.Integer(), server_default='120', nullable=False))
+    # existing shows that would run into the next show at their venue or
+    # by their artist are cut short to end when it starts; shows booked at
+    # the very same time become empty periods, which overlap nothing
+    op.execute("""
+        UPDATE "Show" s
+        SET duration_minutes = floor(extract(epoch FROM n.next_start - s.start_time) / 60)::integer
+        FROM (
+            SELECT id, LEAST(
+                lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id),
+                lead(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id)) AS next_start
+            FROM "Show" WHERE start_time IS NOT NULL
+        ) n
+        WHERE n.id = s.id
+          AND n.next_start < s.start_time + s.duration_minutes * interval '1 minute'
+    """)
+    for column in ('venue_id', 'artist_id'):
+        op.create_exclude_constraint(
+            'ex_Show_{}_period'.format(column), 'Show',
+            (column, '='), (sa.text(PERIOD), '&&'),
+            using='gist', where=sa.text('start_time IS NOT NULL'))
+
+
+def downgrade():
+    op.drop_constraint('ex_Show_artist_id_period', 'Show', type_='exclude')
+    op.drop_constraint('ex_Show_venue_id_period', 'Show', type_='exclude')
+    op.drop_column('Show', 'duration_minutes')
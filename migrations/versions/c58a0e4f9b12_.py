@@ -0,0 +1,41 @@
+"""add show counters to venues and artists
+
+Revision ID: c58a0e4f9b12
+Revises: 9d4e2b7a61f0
+Create Date: 2026-10-18 13:02:48.116530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c58a0e4f9b12'
+down_revision = '9d4e2b7a61f0'
+branch_labels = None
+depends_on = None
+
+COUNTERS = ('shows_count', 'upcoming_shows_count', 'past_shows_count')
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        for column in COUNTERS:
+            op.add_column(table, sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+
+    # backfill from the existing shows
+    for table, owner in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute('''
+            UPDATE "{table}" SET
+                shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{owner} = "{table}".id),
+                upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{owner} = "{table}".id
+                                        AND "Show".start_time > now()),
+                past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{owner} = "{table}".id
+                                    AND "Show".start_time <= now())
+        '''.format(table=table, owner=owner))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        for column in reversed(COUNTERS):
+            op.drop_column(table, column)
@@ -0,0 +1,29 @@
+"""add TableVersion, counting deletes for the listing validators
+
+Revision ID: e2b7d94c1a68
+Revises: c4e8a1f7b392
+Create Date: 2026-10-19 10:12:43.917205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7d94c1a68'
+down_revision = 'c4e8a1f7b392'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('TableVersion',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('deletes', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute('''INSERT INTO "TableVersion" (name) VALUES ('Venue'), ('Artist'), ('Show')''')
+
+
+def downgrade():
+    op.drop_table('TableVersion')
@@ -0,0 +1,24 @@
+"""default Venue.seeking_talent in the database, for rows loaded with COPY
+
+Revision ID: f5c2a8d61b3e
+Revises: e2b7d94c1a68
+Create Date: 2026-10-20 09:41:05.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5c2a8d61b3e'
+down_revision = 'e2b7d94c1a68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('Venue', 'seeking_talent', server_default=sa.false())
+
+
+def downgrade():
+    op.alter_column('Venue', 'seeking_talent', server_default=None)
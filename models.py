@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import ARRAY, ExcludeConstraint
+from sqlalchemy.ext.hybrid import hybrid_property
+
+db = SQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+
+class TimestampMixin(object):
+    # UTC creation/modification times, used as HTTP validators
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           server_default=db.text("timezone('utc', now())"))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, index=True,
+                           server_default=db.text("timezone('utc', now())"))
+
+
+class TableVersion(db.Model):
+    # rows deleted from each table so far, counted by the session (see
+    # "Conditional requests" in app.py). Listing validators read it since a
+    # delete leaves no updated_at behind.
+    __tablename__ = 'TableVersion'
+
+    name = db.Column(db.String(64), primary_key=True)
+    deletes = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+
+
+class Area(db.Model):
+    # a (city, state) pair shared by venues and artists. city_key is the
+    # lower-cased, whitespace-collapsed city that rows are matched on; city
+    # is the spelling the area was created with. See "Areas" in app.py.
+    __tablename__ = 'Area'
+    __table_args__ = (
+        db.UniqueConstraint('state', 'city_key', name='uq_Area_state_city_key'),
+        db.Index('ix_Area_state_city_id', 'state', 'city', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    city = db.Column(db.String(120), nullable=False)
+    city_key = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+
+    venues = db.relationship('Venue', back_populates='area')
+    artists = db.relationship('Artist', back_populates='area')
+
+
+class Venue(TimestampMixin, db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_area_id_name_id', 'area_id', 'name', 'id'),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False, unique=True)
+    genres = db.Column(ARRAY(db.String))
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    # set from city/state on every write
+    area_id = db.Column(db.Integer, db.ForeignKey('Area.id'))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    website = db.Column(db.String)
+    seeking_talent = db.Column(db.Boolean, nullable=False, default=False,
+                               server_default=db.false())
+    seeking_description = db.Column(db.String)
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+
+    # maintained from Show writes, see "Show counters" in app.py
+    shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    show_venue_id = db.relationship(
+        'Show', backref='venueshows', passive_deletes=True)
+    area = db.relationship('Area', back_populates='venues')
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+
+class Artist(TimestampMixin, db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False, unique=True)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    # set from city/state on every write
+    area_id = db.Column(db.Integer, db.ForeignKey('Area.id'), index=True)
+    phone = db.Column(db.String(120))
+    genres = db.Column(ARRAY(db.String), nullable=False)
+    website = db.Column(db.String)
+    seeking_description = db.Column(db.String)
+    seeking_venue = db.Column(db.String)
+    image_link = db.Column(db.String(500), unique=True)
+    facebook_link = db.Column(db.String(120))
+
+    # maintained from Show writes, see "Show counters" in app.py
+    shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    show_artist_id = db.relationship(
+        'Show', backref='artistshows', passive_deletes=True)
+    area = db.relationship('Area', back_populates='artists')
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+
+
+# The period a show takes up, as written in its exclusion constraints
+SHOW_PERIOD = "tsrange(start_time, start_time + duration_minutes * interval '1 minute')"
+
+
+class Show(TimestampMixin, db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        # a venue, or an artist, has one show at a time. The GiST indexes
+        # behind these (btree_gist) also answer the range queries in
+        # "Bookings" in app.py, which spell the period the same way.
+        ExcludeConstraint(('venue_id', '='), (db.text(SHOW_PERIOD), '&&'),
+                          name='ex_Show_venue_id_period', using='gist',
+                          where=db.text('start_time IS NOT NULL')),
+        ExcludeConstraint(('artist_id', '='), (db.text(SHOW_PERIOD), '&&'),
+                          name='ex_Show_artist_id_period', using='gist',
+                          where=db.text('start_time IS NOT NULL')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey(
+        "Venue.id", ondelete='CASCADE'))
+    artist_id = db.Column(db.Integer, db.ForeignKey(
+        "Artist.id", ondelete='CASCADE'))
+    start_time = db.Column(db.DateTime, index=True)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=120,
+                                 server_default='120')
+
+    @hybrid_property
+    def end_time(self):
+        return self.start_time + timedelta(minutes=self.duration_minutes)
+
+    @end_time.expression
+    def end_time(cls):
+        return cls.start_time + cls.duration_minutes * db.literal_column(
+            "interval '1 minute'", db.Interval)
+
+    @hybrid_property
+    def period(self):
+        return self.start_time, self.end_time
+
+    @period.expression
+    def period(cls):
+        # [start_time, end_time), so back-to-back shows do not overlap
+        return db.func.tsrange(cls.start_time, cls.end_time)
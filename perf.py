@@ -0,0 +1,130 @@
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Per-request SQL accounting. Every statement run while a request is being
+# handled is counted and timed; the totals go out in a Server-Timing
+# header, slow requests are logged and per-route figures are kept for
+# /_debug/perf. A streamed body (stream_template) runs its queries after
+# the headers have left: Server-Timing then only covers what ran before,
+# and the request is logged and recorded when the body has been sent.
+
+
+class RouteStats:
+    # per-route totals for one worker process
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.routes = {}
+
+    def record(self, route, seconds, queries, db_seconds, slowest):
+        with self._lock:
+            entry = self.routes.get(route)
+            if entry is None:
+                entry = self.routes[route] = {
+                    'requests': 0,
+                    'seconds_total': 0.0,
+                    'seconds_max': 0.0,
+                    'queries_total': 0,
+                    'queries_max': 0,
+                    'db_seconds_total': 0.0,
+                    'slowest_query': None,
+                }
+            entry['requests'] += 1
+            entry['seconds_total'] += seconds
+            entry['seconds_max'] = max(entry['seconds_max'], seconds)
+            entry['queries_total'] += queries
+            entry['queries_max'] = max(entry['queries_max'], queries)
+            entry['db_seconds_total'] += db_seconds
+            if slowest and (entry['slowest_query'] is None
+                            or slowest[0][0] > entry['slowest_query']['seconds']):
+                entry['slowest_query'] = {'seconds': slowest[0][0], 'statement': slowest[0][1]}
+
+    def summary(self, order_by='seconds_total', limit=20):
+        # the worst routes first, with per-request averages
+        with self._lock:
+            routes = [dict(entry, route=route) for route, entry in self.routes.items()]
+        for entry in routes:
+            entry['seconds_avg'] = entry['seconds_total'] / entry['requests']
+            entry['queries_avg'] = entry['queries_total'] / entry['requests']
+            entry['db_seconds_avg'] = entry['db_seconds_total'] / entry['requests']
+        routes.sort(key=lambda entry: entry[order_by], reverse=True)
+        return routes[:limit]
+
+
+route_stats = RouteStats()
+
+
+def track_queries(app, engine):
+    config = app.config
+    if not config['PERF_ACCOUNTING']:
+        return
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'perf' in g:
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started or not has_request_context() or 'perf' not in g:
+            return
+        seconds = time.perf_counter() - started.pop()
+        perf = g.perf
+        perf['queries'] += 1
+        perf['db_seconds'] += seconds
+        slowest = perf['slowest']
+        slowest.append((seconds, statement[:500]))
+        slowest.sort(key=lambda item: item[0], reverse=True)
+        del slowest[config['PERF_SLOWEST_QUERIES']:]
+
+    @app.before_request
+    def start_accounting():
+        g.perf = {
+            'started': time.perf_counter(),
+            'queries': 0,
+            'db_seconds': 0.0,
+            'slowest': [],
+        }
+
+    @app.after_request
+    def finish_accounting(response):
+        # g.perf stays in place: a streamed body keeps adding to it
+        perf = g.get('perf')
+        if perf is None:
+            return response
+        seconds = time.perf_counter() - perf['started']
+        response.headers.add(
+            'Server-Timing',
+            'db;dur={:.1f};desc="{} queries", app;dur={:.1f}'.format(
+                perf['db_seconds'] * 1000, perf['queries'], seconds * 1000))
+
+        route = request.url_rule.rule if request.url_rule else request.path
+        method, path, full_path = request.method, request.path, request.full_path
+
+        def record():
+            seconds = time.perf_counter() - perf['started']
+            route_stats.record(route, seconds, perf['queries'], perf['db_seconds'], perf['slowest'])
+            if (seconds * 1000 >= config['SLOW_REQUEST_MS']
+                    or perf['queries'] >= config['SLOW_REQUEST_QUERIES']):
+                app.logger.warning(
+                    'slow request %s %s: %.1f ms, %d queries, %.1f ms in the db',
+                    method, full_path, seconds * 1000,
+                    perf['queries'], perf['db_seconds'] * 1000)
+            for query_seconds, statement in perf['slowest']:
+                if query_seconds * 1000 >= config['SLOW_QUERY_MS']:
+                    app.logger.warning('slow query (%.1f ms) in %s %s: %s',
+                                       query_seconds * 1000, method, path, statement)
+
+        if response.is_streamed:
+            response.call_on_close(record)
+        else:
+            record()
+        return response
@@ -2,3 +2,25 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// typeahead for the search boxes: fills the input's datalist from
+// /autocomplete as the user types
+document.addEventListener('input', function (e) {
+  var input = e.target;
+  if (!input.dataset || !input.dataset.autocomplete) return;
+  var q = input.value.trim();
+  if (!q) return;
+  fetch('/autocomplete?kind=' + input.dataset.autocomplete + '&q=' + encodeURIComponent(q))
+    .then(function (response) { return response.json(); })
+    .then(function (body) {
+      if (input.value.trim() !== q) return;
+      var list = input.list;
+      list.innerHTML = '';
+      body.data.forEach(function (row) {
+        var option = document.createElement('option');
+        option.value = row.name;
+        list.appendChild(option);
+      });
+    })
+    .catch(function () {});
+});
@@ -0,0 +1,55 @@
+"""Static bundles: minifying, building and the manifest."""
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import assets  # noqa: E402
+
+
+@pytest.fixture
+def static(tmp_path, monkeypatch):
+    (tmp_path / 'a.css').write_text('/* note */\nbody {\n  color : red ;\n}\n')
+    (tmp_path / 'b.min.css').write_text('p{margin:0}')
+    (tmp_path / 'a.js').write_text('var a = 1;')
+    monkeypatch.setattr(assets, 'BUNDLES', {'site.css': ['a.css', 'b.min.css'],
+                                            'site.js': ['a.js']})
+    return tmp_path
+
+
+def test_minify_css_without_a_minifier(monkeypatch):
+    monkeypatch.setattr(assets, 'rcssmin', None)
+    assert assets.minify_css('/* x */ a > b {\n color : red ;\n}') == 'a>b{color:red;}'
+
+
+def test_build_writes_hashed_bundles_and_manifest(static, monkeypatch):
+    monkeypatch.setattr(assets, 'rcssmin', None)
+    built = assets.build_assets(str(static))
+
+    manifest = assets.load_manifest(str(static))
+    assert manifest == {name: filename for name, (filename, _) in built.items()}
+    assert json.loads((static / 'dist' / 'manifest.json').read_text()) == manifest
+
+    css = manifest['site.css']
+    assert css.startswith('site.') and css.endswith('.css')
+    body = (static / 'dist' / css).read_bytes()
+    # .min sources are copied as they are
+    assert body == b'body{color:red;}\np{margin:0}'
+    assert gzip.decompress((static / 'dist' / (css + '.gz')).read_bytes()) == body
+    assert built['site.css'][1] == len(body)
+    assert (static / 'dist' / manifest['site.js']).read_bytes().startswith(b'var a')
+
+
+def test_bundle_name_follows_its_content(static):
+    first = assets.build_assets(str(static))['site.css'][0]
+    assert assets.build_assets(str(static))['site.css'][0] == first
+    (static / 'b.min.css').write_text('p{margin:1px}')
+    assert assets.build_assets(str(static))['site.css'][0] != first
+
+
+def test_no_manifest_before_a_build(tmp_path):
+    assert assets.load_manifest(str(tmp_path)) == {}
@@ -0,0 +1,72 @@
+"""autocomplete.PrefixIndex, without a database."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autocomplete import PrefixIndex  # noqa: E402
+
+
+@pytest.fixture
+def index():
+    index = PrefixIndex()
+    index.load([
+        ('venue', 1, 'The Musical Hop'),
+        ('venue', 2, 'Park Square Live Music & Coffee'),
+        ('artist', 1, 'Guns N Petals'),
+        ('artist', 2, 'Matt Quevedo'),
+    ])
+    return index
+
+
+def test_matches_the_start_of_any_word(index):
+    assert index.search('venue', 'mus') == [(2, 'Park Square Live Music & Coffee'),
+                                            (1, 'The Musical Hop')]
+    assert index.search('venue', 'HOP') == [(1, 'The Musical Hop')]
+    assert index.search('venue', '  the   musical ') == [(1, 'The Musical Hop')]
+    # inside a word is not a prefix
+    assert index.search('venue', 'usic') == []
+
+
+def test_prefix_bounds(index):
+    # the scan stops at the end of the prefix and of the kind
+    assert index.search('artist', 'm') == [(2, 'Matt Quevedo')]
+    assert index.search('artist', 'zz') == []
+    assert index.search('venue', 'guns') == []
+    assert index.search('venue', '') == []
+    assert index.search('venue', 'p', limit=1) == [(2, 'Park Square Live Music & Coffee')]
+
+
+def test_only_the_first_words_are_keys():
+    index = PrefixIndex(max_words=2)
+    index.load([('artist', 1, 'one two three')])
+    assert index.search('artist', 'two') == [(1, 'one two three')]
+    assert index.search('artist', 'three') == []
+
+
+def test_add_remove_and_rename(index):
+    index.add('artist', 3, 'The Wild Sax Band')
+    assert index.search('artist', 'sax') == [(3, 'The Wild Sax Band')]
+
+    index.add('artist', 3, 'The Tame Sax Band')
+    assert index.search('artist', 'wild') == []
+    assert index.search('artist', 'tame') == [(3, 'The Tame Sax Band')]
+
+    size = len(index)
+    index.remove('artist', 3)
+    index.remove('artist', 3)
+    assert index.search('artist', 'sax') == []
+    assert len(index) == size - len(index.keys('The Tame Sax Band'))
+
+
+def test_max_entries_keeps_the_first_rows():
+    index = PrefixIndex(max_entries=3)
+    index.load([('venue', 1, 'a b'), ('venue', 2, 'c d'), ('venue', 3, 'e')])
+    assert len(index) == 2
+    assert index.search('venue', 'c') == []
+    index.add('venue', 3, 'e')
+    assert index.search('venue', 'e') == [(3, 'e')]
+    index.add('venue', 4, 'f g')
+    assert index.search('venue', 'f') == []
@@ -0,0 +1,57 @@
+"""The page cache backends that need no server."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache  # noqa: E402
+from cache import LRUCache, NullCache, make_cache  # noqa: E402
+
+
+def test_evicts_the_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.set('a', '1')
+    lru.set('b', '2')
+    assert lru.get('a') == '1'
+    lru.set('c', '3')
+    assert lru.get('b') is None
+    assert (lru.get('a'), lru.get('c')) == ('1', '3')
+
+
+def test_setting_again_refreshes():
+    lru = LRUCache(maxsize=2)
+    lru.set('a', '1')
+    lru.set('b', '2')
+    lru.set('a', '1 again')
+    lru.set('c', '3')
+    assert (lru.get('a'), lru.get('b')) == ('1 again', None)
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    lru = LRUCache(ttl=10)
+    lru.set('a', '1')
+    now[0] += 10
+    assert lru.get('a') == '1'
+    now[0] += 1
+    assert lru.get('a') is None
+
+
+def test_delete_and_clear():
+    lru = LRUCache()
+    lru.set('a', '1')
+    lru.set('b', '2')
+    lru.delete('a', 'missing')
+    assert (lru.get('a'), lru.get('b')) == (None, '2')
+    lru.clear()
+    assert lru.get('b') is None
+
+
+def test_backend_from_config():
+    assert isinstance(make_cache({}), LRUCache)
+    assert isinstance(make_cache({'PAGE_CACHE_BACKEND': 'null'}), NullCache)
+    with pytest.raises(ValueError):
+        make_cache({'PAGE_CACHE_BACKEND': 'memcached'})
@@ -0,0 +1,52 @@
+"""TimedQueuePool wait and connect accounting, on sqlite3 connections."""
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbpool import TimedQueuePool, stats  # noqa: E402
+
+
+def slow_connect():
+    time.sleep(0.05)
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+@pytest.fixture
+def pool():
+    stats.reset()
+    pool = TimedQueuePool(slow_connect, pool_size=1, max_overflow=0, timeout=0.2)
+    yield pool
+    pool.dispose()
+
+
+def test_connecting_is_not_waiting(pool):
+    pool.connect().close()
+    pool.connect().close()
+    snapshot = stats.snapshot()
+    assert snapshot['waits'] == 0
+    assert snapshot['connect_seconds_total'] >= 0.05
+
+
+def test_blocked_checkout_is_a_wait(pool):
+    held = pool.connect()
+    threading.Timer(0.1, held.close).start()
+    pool.connect().close()
+    snapshot = stats.snapshot()
+    assert snapshot['waits'] == 1
+    assert 0.05 < snapshot['wait_seconds_max'] < 0.2
+
+
+def test_timed_out_checkout_is_a_wait(pool):
+    held = pool.connect()
+    with pytest.raises(PoolTimeout):
+        pool.connect()
+    held.close()
+    assert stats.snapshot()['waits'] == 1
+    assert stats.snapshot()['wait_seconds_max'] >= 0.2
@@ -0,0 +1,76 @@
+"""The hot Show queries are answered from the Show indexes.
+
+Needs a PostgreSQL database migrated to head (`flask db upgrade`), named
+by DATABASE_URL; skipped otherwise. Nothing is written: each query is run
+once to capture its SQL, then EXPLAINed with sequential scans disabled,
+so the plan shows whether an index can serve it at all, whatever the
+table sizes.
+
+    DATABASE_URL=postgresql://... python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get('DATABASE_URL', '').startswith('postgresql'):
+    pytest.skip('needs DATABASE_URL pointing at a PostgreSQL database',
+                allow_module_level=True)
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app, shows_page, show_timeline  # noqa: E402
+from models import db  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    return create_app({'DEBUG': True})
+
+
+def captured(app, run):
+    # the statements `run` sends to the database, with their parameters
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+
+def plan(statement, parameters):
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('SET enable_seqscan = off')
+        rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters).all()
+        connection.rollback()
+    return '\n'.join(row[0] for row in rows)
+
+
+def only_show_query(statements):
+    shows = [item for item in statements if 'FROM "Show"' in item[0]]
+    assert len(shows) == 1, statements
+    return shows[0]
+
+
+@pytest.mark.parametrize('owner, index', [
+    ('venue_id', 'ix_Show_venue_id_start_time'),
+    ('artist_id', 'ix_Show_artist_id_start_time'),
+])
+def test_show_timeline_uses_owner_index(app, owner, index):
+    with app.app_context():
+        statements = captured(app, lambda: show_timeline(**{owner: 1}))
+        assert index in plan(*only_show_query(statements))
+
+
+@pytest.mark.parametrize('query_string', ['', '?after=2030-01-01T20%3A00%3A00,1'])
+def test_shows_page_uses_start_time_index(app, query_string):
+    with app.test_request_context('/shows' + query_string):
+        statements = captured(app, lambda: list(shows_page()['rows']))
+        assert 'ix_Show_start_time' in plan(*only_show_query(statements))
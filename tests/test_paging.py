@@ -0,0 +1,103 @@
+"""Keyset pagination and its cursors, without a database server.
+
+keyset_page only needs a query with tuple comparisons, so these run it on
+an in-memory SQLite table.
+"""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+from werkzeug.exceptions import BadRequest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, decode_cursor, encode_cursor, keyset_page, naive_datetime  # noqa: E402
+
+metadata = sa.MetaData()
+events = sa.Table('events', metadata,
+                  sa.Column('id', sa.Integer, primary_key=True),
+                  sa.Column('start_time', sa.DateTime))
+START = datetime(2030, 1, 1, 20)
+
+
+@pytest.fixture(scope='module')
+def app():
+    return create_app({'DEBUG': True, 'PAGE_SIZE': 3, 'MAX_PAGE_SIZE': 5})
+
+
+@pytest.fixture
+def session():
+    engine = sa.create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        # the last three share a start time, so the id breaks the tie
+        connection.execute(events.insert(), [
+            {'id': id, 'start_time': START + timedelta(hours=min(id, 5))} for id in range(1, 8)])
+    with Session(engine) as session:
+        yield session
+
+
+def page_of(app, session, query_string=''):
+    with app.test_request_context('/events' + query_string):
+        page = keyset_page(session.query(events.c.start_time, events.c.id),
+                           (events.c.start_time, events.c.id), (naive_datetime, int),
+                           lambda row: (row[0].isoformat(), row[1]))
+        page['rows'] = [row[1] for row in page['rows']]
+    return page
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(('2030-01-01T20:00:00', 'a,b', 5))
+    assert cursor == '2030-01-01T20%3A00%3A00,a%2Cb,5'
+    assert decode_cursor(cursor, (naive_datetime, str, int)) == [START, 'a,b', 5]
+
+
+@pytest.mark.parametrize('cursor', ['2030-01-01T20:00:00', '2030-01-01T20:00:00,x', 'nope,1'])
+def test_bad_cursor_is_a_bad_request(cursor):
+    with pytest.raises(BadRequest):
+        decode_cursor(cursor, (naive_datetime, int))
+
+
+def test_naive_datetime_converts_offsets():
+    assert naive_datetime('2030-01-01T20:00:00') == START
+    aware = datetime(2030, 1, 1, 20, tzinfo=timezone.utc)
+    assert naive_datetime('2030-01-01T20:00:00+00:00') == aware.astimezone().replace(tzinfo=None)
+
+
+def test_pages_forward_and_back(app, session):
+    first = page_of(app, session)
+    assert first['rows'] == [1, 2, 3]
+    assert first['prev'] is None
+
+    second = page_of(app, session, '?after=' + first['next'])
+    assert second['rows'] == [4, 5, 6]
+    assert second['prev'] is not None
+
+    last = page_of(app, session, '?after=' + second['next'])
+    assert last['rows'] == [7]
+    assert last['next'] is None
+
+    back = page_of(app, session, '?before=' + second['prev'])
+    assert back['rows'] == [1, 2, 3]
+    assert back['prev'] is None
+    assert back['next'] == first['next']
+
+
+def test_limit_is_clamped(app, session):
+    assert len(page_of(app, session, '?limit=100')['rows']) == 5
+    assert len(page_of(app, session, '?limit=0')['rows']) == 1
+
+
+def test_streamed_page_matches(app, session):
+    listed = page_of(app, session, '?limit=4')
+    with app.test_request_context('/events?limit=4'):
+        page = keyset_page(session.query(events.c.start_time, events.c.id),
+                           (events.c.start_time, events.c.id), (naive_datetime, int),
+                           lambda row: (row[0].isoformat(), row[1]), stream=True)
+        assert page['next'] is None
+        assert [row[1] for row in page['rows']] == listed['rows']
+        # known once the rows have been read
+        assert page['next'] == listed['next']
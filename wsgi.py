@@ -0,0 +1,4 @@
+from app import create_app
+
+# WSGI entry point, e.g. `gunicorn wsgi:app` (see gunicorn.conf.py)
+app = create_app()